@@ -8,6 +8,7 @@ class AppConfig(_AppConfig):
         """
         Called when the app is ready.
         """
+        from . import signals  # noqa: F401
         from .models import monkey_patch_richtext
 
         monkey_patch_richtext()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app.models.wagtail.mixins import GeocodedMixin
+from app.utils.map_feed import invalidate_map_feed
+from app.utils.wagtail import model_subclasses
+
+
+class Command(BaseCommand):
+    help = "Materialise the map point of every geocoded page, from its coordinates or related countries."
+
+    def handle(self, *args, **options):
+        GeocodedMixin.update_map_points()
+        for model in model_subclasses(GeocodedMixin):
+            print(
+                model._meta.verbose_name,
+                model.objects.filter(map_point__isnull=False).count(),
+                "of",
+                model.objects.count(),
+                "pages mapped",
+            )
+        invalidate_map_feed()
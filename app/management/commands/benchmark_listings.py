@@ -0,0 +1,72 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from wagtail.models import Page
+from wagtail.rich_text import RichText
+
+from app.models.wagtail import ArticlePage
+from app.utils.wagtail import localize_pages
+
+PARAGRAPH = "<p>Mapping for humanitarian response and development. " * 40 + "</p>"
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare loading full and listing-projected pages, on generated pages that are rolled back afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=10000)
+        parser.add_argument("--page-size", type=int, default=50)
+
+    def handle(self, *args, pages=10000, page_size=50, **options):
+        try:
+            with transaction.atomic():
+                self.create_pages(pages)
+                self.compare("one page of cards", page_size)
+                self.compare("every page", pages)
+                raise Rollback
+        except Rollback:
+            print("Generated pages rolled back")
+
+    def create_pages(self, count):
+        parent = Page.get_first_root_node()
+        started = time.perf_counter()
+        for n in range(count):
+            parent.add_child(
+                instance=ArticlePage(
+                    title=f"Benchmark article {n}",
+                    slug=f"benchmark-article-{n}",
+                    content=[("richtext", RichText(PARAGRAPH * 5))],
+                    frontmatter={"body": PARAGRAPH * 5},
+                    live=True,
+                )
+            )
+        print(f"Created {count} pages in {time.perf_counter() - started:.1f}s")
+
+    def measure(self, pages, for_listing):
+        tracemalloc.start()
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            loaded = localize_pages(pages, for_listing=for_listing)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return len(loaded), elapsed, peak, len(queries)
+
+    def compare(self, label, count):
+        pages = list(
+            Page.objects.type(ArticlePage).order_by("-first_published_at", "pk")[:count]
+        )
+        print(f"Loading {label} ({len(pages)} pages):")
+        for name, for_listing in (("full rows", False), ("listing fields", True)):
+            loaded, elapsed, peak, queries = self.measure(pages, for_listing)
+            print(
+                f"  {name:>14}: {elapsed * 1000:8.1f}ms,"
+                f" {peak / 1024**2:7.1f}MB peak, {queries} queries"
+            )
@@ -0,0 +1,66 @@
+import timeit
+
+from bs4 import BeautifulSoup
+from django.core.management.base import BaseCommand
+from django.utils.text import slugify
+
+from app.models.wagtail.mixins import PreviewablePage
+from app.utils.richtext import add_heading_ids, cached_heading_ids, clear_heading_cache
+from app.utils.streamfield import richtext_html
+from app.utils.wagtail import model_subclasses
+
+SAMPLE_SECTION = """
+<h2>Section {n}</h2>
+<p>Open mapping for <b>humanitarian</b> response &amp; development, section {n}.</p>
+<ul><li>Roads</li><li>Buildings</li><li>Waterways</li></ul>
+<h3 data-block-key="k{n}">Further reading {n}</h3>
+<p><a href="/en/resources/">Resources</a> and <i>guides</i>.</p>
+"""
+
+
+def soup_heading_ids(html):
+    # How headings were anchored before: parse the whole document, then re-serialise it
+    soup = BeautifulSoup(html, "lxml")
+    for heading in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
+        heading["id"] = slugify(heading.get_text())
+    return soup.prettify()
+
+
+class Command(BaseCommand):
+    help = "Time the heading-id pass over rich text: BeautifulSoup against the regex rewriter and its cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, pages=50, repeat=20, **options):
+        samples = []
+        for model in model_subclasses(PreviewablePage):
+            if not hasattr(model, "content"):
+                continue
+            for page in model.objects.live()[:pages]:
+                samples += richtext_html(page.content)
+        if not samples:
+            print("No rich text found, using generated samples")
+            samples = [
+                "".join(SAMPLE_SECTION.format(n=n) for n in range(sections))
+                for sections in (1, 5, 20)
+            ]
+        print(len(samples), "rich text fragments,", sum(map(len, samples)), "chars")
+
+        def run(fn):
+            return lambda: [fn(html) for html in samples]
+
+        clear_heading_cache()
+        results = {
+            "beautifulsoup": timeit.timeit(run(soup_heading_ids), number=repeat),
+            "rewriter": timeit.timeit(run(add_heading_ids), number=repeat),
+            # The first pass fills the cache, later ones are hits
+            "rewriter, cached": timeit.timeit(run(cached_heading_ids), number=repeat),
+        }
+        baseline = results["beautifulsoup"]
+        for name, seconds in results.items():
+            print(
+                f"{name:>18}: {seconds / repeat * 1000:8.2f}ms per pass"
+                f" ({baseline / seconds:.1f}x)"
+            )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from app.models.wagtail.mixins import PreviewablePage
+from app.utils.wagtail import model_subclasses
+
+
+class Command(BaseCommand):
+    help = "Recompute the plain text, word count, first image, outline, summary and theme stored on every page."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only pages whose fields haven't been derived yet",
+        )
+
+    def handle(self, *args, missing=False, **options):
+        for model in model_subclasses(PreviewablePage):
+            pages = model.objects.all()
+            if missing:
+                pages = pages.filter(plain_text__isnull=True)
+
+            batch = []
+            updated = 0
+            fields = model.derived_fields + ["effective_theme_class"]
+            for page in pages.iterator(chunk_size=200):
+                page.update_derived_fields()
+                page.update_theme_class()
+                batch.append(page)
+                if len(batch) == 200:
+                    model.objects.bulk_update(batch, fields)
+                    updated += len(batch)
+                    batch = []
+            model.objects.bulk_update(batch, fields)
+            updated += len(batch)
+            print(model._meta.verbose_name, updated, "pages updated")
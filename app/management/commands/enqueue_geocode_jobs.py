@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from app.models import GeocodeJob
+from app.models.wagtail.mixins import GeocodedMixin
+from app.utils.wagtail import model_subclasses
+
+
+class Command(BaseCommand):
+    help = "Queue geocoding jobs for pages missing a location name. Run `run_geocode_jobs` to process them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--forward",
+            action="store_true",
+            help="Also geocode the location names of pages without coordinates",
+        )
+
+    def handle(self, *args, **options):
+        for model in model_subclasses(GeocodedMixin):
+            pages = model.objects.filter(
+                coordinates__isnull=False, geographical_location__isnull=True
+            )
+            for page in pages:
+                GeocodeJob.enqueue(
+                    page, GeocodeJob.Kind.REVERSE, coordinates=page.coordinates
+                )
+            print("Queued", pages.count(), model._meta.verbose_name, "reverse geocodes")
+
+            if options["forward"]:
+                pages = model.objects.filter(
+                    coordinates__isnull=True, geographical_location__isnull=False
+                ).exclude(geographical_location="")
+                for page in pages:
+                    GeocodeJob.enqueue(
+                        page, GeocodeJob.Kind.FORWARD, query=page.geographical_location
+                    )
+                print(
+                    "Queued",
+                    pages.count(),
+                    model._meta.verbose_name,
+                    "forward geocodes",
+                )
@@ -1,16 +1,12 @@
-import time
-
 from django.core.management.base import BaseCommand
-from django.db import transaction
 
 from app.models import CountryPage
 
 
 class Command(BaseCommand):
-    help = "Sync all CountryPage coordinates so that pages can be geo-tagged via related_countries."
+    help = "Sync all CountryPage coordinates so that pages can be geo-tagged via related_countries. Run load_country_boundaries first."
 
     def handle(self, *args, **options):
-        centroids = CountryPage.get_centroids()
         for country in CountryPage.objects.all():
             if country.centroid is None:
-                country.save_centroid(centroids)
+                country.save_centroid()
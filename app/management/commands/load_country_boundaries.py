@@ -0,0 +1,44 @@
+import json
+
+import requests
+from django.core.management.base import BaseCommand
+
+from app.models import CountryPage
+from app.utils.country_boundaries import (
+    NATURAL_EARTH_URL,
+    NATURAL_EARTH_VERSION,
+    load_country_boundaries,
+)
+
+
+class Command(BaseCommand):
+    help = "Load country boundaries and centroids from Natural Earth, so CountryPages don't need geocoding."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=NATURAL_EARTH_URL,
+            help="URL or file path of a GeoJSON FeatureCollection of countries",
+        )
+        parser.add_argument(
+            "--dataset-version",
+            default=NATURAL_EARTH_VERSION,
+            help="Recorded against each boundary, to tell which dataset it came from",
+        )
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        if source.startswith(("http://", "https://")):
+            response = requests.get(source, timeout=60)
+            response.raise_for_status()
+            collection = response.json()
+        else:
+            with open(source) as f:
+                collection = json.load(f)
+
+        count = load_country_boundaries(collection, options["dataset_version"])
+        print("Loaded", count, "country boundaries from", options["dataset_version"])
+
+        for country in CountryPage.objects.filter(centroid__isnull=True):
+            if country.save_centroid():
+                print("Set centroid for", country)
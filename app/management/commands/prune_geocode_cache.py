@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import GeocodeCacheEntry
+from app.utils.geo import GEOCODE_CACHE_REFRESH_AFTER, fetch_reverse_geocode
+
+
+class Command(BaseCommand):
+    help = "Evict reverse geocode cache entries that haven't been used recently, and optionally refresh stale ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--unused-days",
+            type=int,
+            default=365,
+            help="Delete entries that haven't been read for this many days",
+        )
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Refetch Nominatim entries older than the refresh period, at Nominatim's rate limit",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted, _ = GeocodeCacheEntry.objects.filter(
+            last_used_at__lt=now - timedelta(days=options["unused_days"])
+        ).delete()
+        print("Evicted", deleted, "unused entries")
+
+        if options["refresh"]:
+            stale = GeocodeCacheEntry.objects.filter(
+                source=GeocodeCacheEntry.Source.NOMINATIM,
+                fetched_at__lt=now - GEOCODE_CACHE_REFRESH_AFTER,
+            )
+            print("Refreshing", stale.count(), "stale entries")
+            for entry in stale.iterator():
+                fetch_reverse_geocode(entry.cell_x, entry.cell_y, entry.zoom)
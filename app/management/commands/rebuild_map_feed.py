@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from wagtail.models import Locale
+
+from app.utils.map_feed import build_map_feed
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached GeoJSON feed served by the map API, for every locale."
+
+    def handle(self, *args, **options):
+        for locale in Locale.objects.all():
+            feed = build_map_feed(locale.language_code)
+            print("Rebuilt", locale.language_code, feed["etag"])
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from wagtail.models import Page
+
+from app.models import PageMetadataIndex
+from app.utils.page_metadata import index_page_metadata
+
+
+class Command(BaseCommand):
+    help = "Rebuild the directory's metadata index of every live page."
+
+    def handle(self, *args, **options):
+        pages = Page.objects.live().specific().iterator(chunk_size=200)
+        indexed = 0
+        for page in pages:
+            index_page_metadata(page)
+            indexed += 1
+        stale = PageMetadataIndex.objects.exclude(page__live=True).update(live=False)
+        print("Indexed", indexed, "pages, marked", stale, "entries as not live")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from wagtail.models import Page
+
+from app.models import PageSearchIndex
+from app.utils.search import index_page
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of every live page."
+
+    def handle(self, *args, **options):
+        pages = Page.objects.live().specific().iterator(chunk_size=200)
+        indexed = 0
+        for page in pages:
+            index_page(page)
+            indexed += 1
+        deleted, _ = PageSearchIndex.objects.exclude(page__live=True).delete()
+        print("Indexed", indexed, "pages, removed", deleted, "stale entries")
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.utils.geocode_jobs import claim_geocode_jobs, run_geocode_job
+
+
+class Command(BaseCommand):
+    help = "Work through queued geocoding jobs. Several workers can run at once; Nominatim's rate limit is shared between them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty, instead of polling for new jobs",
+        )
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between checks of an empty queue",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            jobs = claim_geocode_jobs(options["batch_size"])
+            if not jobs:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+            for job in jobs:
+                succeeded = run_geocode_job(job)
+                print(job, "" if succeeded else job.last_error)
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from app.models import GeocodeCacheEntry
+from app.models.wagtail.mixins import GeocodedMixin
+from app.utils.geo import fetch_reverse_geocode, grid_cell
+from app.utils.wagtail import model_subclasses
+
+
+class Command(BaseCommand):
+    help = "Fill the reverse geocode cache from the location names already on pages, and optionally fetch the rest from Nominatim."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--zoom", type=int, default=5)
+        parser.add_argument(
+            "--fetch",
+            action="store_true",
+            help="Look up cells that no page has a name for, at Nominatim's rate limit",
+        )
+
+    def handle(self, *args, **options):
+        zoom = options["zoom"]
+        named = {}
+        unnamed = set()
+        for model in model_subclasses(GeocodedMixin):
+            for coordinates, location in model.objects.filter(
+                coordinates__isnull=False
+            ).values_list("coordinates", "geographical_location"):
+                cell = grid_cell(coordinates, zoom)
+                if location:
+                    named.setdefault(cell, location)
+                else:
+                    unnamed.add(cell)
+
+        existing = set(
+            GeocodeCacheEntry.objects.filter(zoom=zoom).values_list("cell_x", "cell_y")
+        )
+        seeded = GeocodeCacheEntry.objects.bulk_create(
+            [
+                GeocodeCacheEntry(
+                    zoom=zoom,
+                    cell_x=cell_x,
+                    cell_y=cell_y,
+                    address=address,
+                    source=GeocodeCacheEntry.Source.PAGE,
+                )
+                for (cell_x, cell_y), address in named.items()
+                if (cell_x, cell_y) not in existing
+            ],
+            ignore_conflicts=True,
+        )
+        print("Seeded", len(seeded), "cells from page location names")
+
+        if options["fetch"]:
+            missing = unnamed - existing - set(named.keys())
+            print("Fetching", len(missing), "cells from Nominatim")
+            for cell_x, cell_y in missing:
+                print(cell_x, cell_y, fetch_reverse_geocode(cell_x, cell_y, zoom))
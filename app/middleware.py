@@ -1,7 +1,14 @@
 # myapp/middleware.py
 from django.conf import settings
-from django.http import HttpResponsePermanentRedirect
+from django.http import HttpResponse, HttpResponsePermanentRedirect
 
+from app.utils.page_cache import (
+    get_cached_page,
+    is_cacheable_request,
+    is_cacheable_response,
+    set_cached_page,
+)
+from app.utils.request_cache import request_cache
 from app.utils.url import urljoin
 
 
@@ -16,3 +23,47 @@ class StagingDomainRedirectMiddleware:
             return HttpResponsePermanentRedirect(new_url)
         else:
             return self.get_response(request)
+
+
+class RequestCacheMiddleware:
+    """
+    Give each request a fresh memo for `app.utils.request_cache.request_memo`
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_cache():
+            return self.get_response(request)
+
+
+class PageCacheMiddleware:
+    """
+    Serve anonymous Wagtail page views from the cache.
+
+    Responses are keyed by path, language and query string, and purged when
+    the page or one of its descendants is published, see `app.signals`.
+    This needs to come after LocaleMiddleware and AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_cacheable_request(request):
+            return self.get_response(request)
+
+        hit = get_cached_page(request)
+        if hit is not None:
+            response = HttpResponse(hit["content"])
+            for header, value in hit["headers"].items():
+                response[header] = value
+            response["X-Page-Cache"] = "HIT"
+            return response
+
+        response = self.get_response(request)
+        if is_cacheable_response(request, response):
+            set_cached_page(request, response)
+            response["X-Page-Cache"] = "MISS"
+        return response
@@ -0,0 +1,80 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:12
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0063_alter_landingpage_show_footer_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="articlepage",
+            name="map_point",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True,
+                editable=False,
+                help_text="Materialised from coordinates, or else the first related country's centroid",
+                null=True,
+                srid=4326,
+            ),
+        ),
+        migrations.AddField(
+            model_name="eventpage",
+            name="map_point",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True,
+                editable=False,
+                help_text="Materialised from coordinates, or else the first related country's centroid",
+                null=True,
+                srid=4326,
+            ),
+        ),
+        migrations.AddField(
+            model_name="opportunitypage",
+            name="map_point",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True,
+                editable=False,
+                help_text="Materialised from coordinates, or else the first related country's centroid",
+                null=True,
+                srid=4326,
+            ),
+        ),
+        migrations.AddField(
+            model_name="organisationpage",
+            name="map_point",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True,
+                editable=False,
+                help_text="Materialised from coordinates, or else the first related country's centroid",
+                null=True,
+                srid=4326,
+            ),
+        ),
+        migrations.AddField(
+            model_name="personpage",
+            name="map_point",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True,
+                editable=False,
+                help_text="Materialised from coordinates, or else the first related country's centroid",
+                null=True,
+                srid=4326,
+            ),
+        ),
+        migrations.AddField(
+            model_name="projectpage",
+            name="map_point",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True,
+                editable=False,
+                help_text="Materialised from coordinates, or else the first related country's centroid",
+                null=True,
+                srid=4326,
+            ),
+        ),
+    ]
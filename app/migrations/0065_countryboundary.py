@@ -0,0 +1,65 @@
+# Generated by Django 4.1.3 on 2026-10-18 10:05
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0064_geocoded_map_point"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CountryBoundary",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("isoa2", models.CharField(max_length=2, unique=True)),
+                ("isoa3", models.CharField(blank=True, max_length=3)),
+                ("name", models.CharField(max_length=255)),
+                (
+                    "geometry",
+                    django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326),
+                ),
+                (
+                    "geometry_fine",
+                    django.contrib.gis.db.models.fields.MultiPolygonField(
+                        blank=True, null=True, srid=4326
+                    ),
+                ),
+                (
+                    "geometry_medium",
+                    django.contrib.gis.db.models.fields.MultiPolygonField(
+                        blank=True, null=True, srid=4326
+                    ),
+                ),
+                (
+                    "geometry_coarse",
+                    django.contrib.gis.db.models.fields.MultiPolygonField(
+                        blank=True, null=True, srid=4326
+                    ),
+                ),
+                (
+                    "centroid",
+                    django.contrib.gis.db.models.fields.PointField(
+                        help_text="A point inside the country, suitable for a map marker",
+                        srid=4326,
+                    ),
+                ),
+                ("dataset_version", models.CharField(max_length=255)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.1.3 on 2026-10-18 10:41
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wagtailcore", "0078_referenceindex"),
+        ("app", "0065_countryboundary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeocodeJob",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("reverse", "Reverse"), ("forward", "Forward")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "coordinates",
+                    django.contrib.gis.db.models.fields.PointField(
+                        blank=True, null=True, srid=4326
+                    ),
+                ),
+                ("query", models.CharField(blank=True, max_length=250)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True)),
+                (
+                    "run_after",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "page",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="geocode_jobs",
+                        to="wagtailcore.page",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="geocodejob",
+            index=models.Index(
+                fields=["status", "run_after"], name="geocodejob_due_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="geocodejob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "pending")),
+                fields=("page", "kind"),
+                name="unique_pending_geocode_job",
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.1.3 on 2026-10-18 11:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0066_geocodejob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeocodeCacheEntry",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("zoom", models.PositiveSmallIntegerField()),
+                ("cell_x", models.IntegerField()),
+                ("cell_y", models.IntegerField()),
+                ("address", models.TextField(blank=True, null=True)),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[("nominatim", "Nominatim"), ("page", "Page")],
+                        default="nominatim",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "fetched_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "last_used_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("hits", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "geocode cache entries",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="geocodecacheentry",
+            constraint=models.UniqueConstraint(
+                fields=("zoom", "cell_x", "cell_y"), name="unique_geocode_cell"
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.3 on 2026-10-18 12:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wagtailcore", "0078_referenceindex"),
+        ("app", "0067_geocodecacheentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PageSearchIndex",
+            fields=[
+                (
+                    "page",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_index",
+                        serialize=False,
+                        to="wagtailcore.page",
+                    ),
+                ),
+                ("config", models.CharField(default="simple", max_length=32)),
+                ("title", models.TextField()),
+                ("summary", models.TextField(blank=True)),
+                ("taxonomy", models.TextField(blank=True)),
+                ("body", models.TextField(blank=True)),
+                (
+                    "search_vector",
+                    django.contrib.postgres.search.SearchVectorField(null=True),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="pagesearchindex",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="pagesearchindex_vector_idx"
+            ),
+        ),
+    ]
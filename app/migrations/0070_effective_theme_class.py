@@ -0,0 +1,108 @@
+# Generated by Django 4.1.3 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0069_derived_page_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="activationindexpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="activationprojectpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="articlepage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="countrypage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="directorypage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="eventpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="impactareapage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="landingpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="magazineindexpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="magazinesection",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="openmappinghubindexpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="opportunitypage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="organisationpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="personpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="projectpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="staticpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="toolpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="topichomepage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="topicpage",
+            name="effective_theme_class",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 4.1.3 on 2026-10-18 15:40
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("wagtailcore", "0078_referenceindex"),
+        ("app", "0070_effective_theme_class"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PageMetadataIndex",
+            fields=[
+                (
+                    "page",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="metadata_index",
+                        serialize=False,
+                        to="wagtailcore.page",
+                    ),
+                ),
+                ("translation_key", models.UUIDField(db_index=True)),
+                ("path", models.CharField(max_length=255)),
+                ("live", models.BooleanField(default=True)),
+                ("public", models.BooleanField(default=True)),
+                (
+                    "years",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.PositiveSmallIntegerField(),
+                        blank=True,
+                        default=list,
+                        size=None,
+                    ),
+                ),
+                (
+                    "country_codes",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=2),
+                        blank=True,
+                        default=list,
+                        size=None,
+                    ),
+                ),
+                (
+                    "impact_area_keys",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.UUIDField(),
+                        blank=True,
+                        default=list,
+                        size=None,
+                    ),
+                ),
+                ("title", models.CharField(max_length=255)),
+                ("sort_date", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+                (
+                    "locale",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="wagtailcore.locale",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="pagemetadataindex",
+            index=models.Index(
+                fields=["path"],
+                name="pagemetadata_path_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pagemetadataindex",
+            index=models.Index(
+                fields=["-sort_date", "-page"], name="pagemetadata_sort_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pagemetadataindex",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["years"], name="pagemetadata_years_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pagemetadataindex",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["country_codes"], name="pagemetadata_countries_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pagemetadataindex",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["impact_area_keys"], name="pagemetadata_impact_areas_idx"
+            ),
+        ),
+    ]
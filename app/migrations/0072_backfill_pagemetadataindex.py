@@ -0,0 +1,74 @@
+# Generated by Django 4.1.3 on 2026-10-18 18:10
+
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def backfill_page_metadata_index(apps, schema_editor):
+    """
+    Index the pages that were live before the index existed, the same way as
+    `app.utils.page_metadata.index_page_metadata` does on publish.
+    """
+    Page = apps.get_model("wagtailcore", "Page")
+    PageViewRestriction = apps.get_model("wagtailcore", "PageViewRestriction")
+    PageMetadataIndex = apps.get_model("app", "PageMetadataIndex")
+
+    country_codes = defaultdict(set)
+    impact_area_keys = defaultdict(set)
+    for model in apps.get_app_config("app").get_models():
+        field_names = {field.name for field in model._meta.get_fields()}
+        if "related_countries" in field_names:
+            for page_id, code in model.objects.filter(
+                live=True, related_countries__isoa2__isnull=False
+            ).values_list("pk", "related_countries__isoa2"):
+                if code:
+                    country_codes[page_id].add(code.upper())
+        if "related_impact_areas" in field_names:
+            for page_id, key in model.objects.filter(
+                live=True, related_impact_areas__isnull=False
+            ).values_list("pk", "related_impact_areas__translation_key"):
+                impact_area_keys[page_id].add(key)
+
+    restricted_paths = tuple(
+        PageViewRestriction.objects.values_list("page__path", flat=True)
+    )
+    entries = []
+    for page in Page.objects.filter(live=True).exclude(depth=1).iterator():
+        published = [
+            published_at
+            for published_at in (page.first_published_at, page.last_published_at)
+            if published_at is not None
+        ]
+        entries.append(
+            PageMetadataIndex(
+                page_id=page.pk,
+                content_type_id=page.content_type_id,
+                locale_id=page.locale_id,
+                translation_key=page.translation_key,
+                path=page.path,
+                live=True,
+                public=not page.path.startswith(restricted_paths),
+                years=sorted({published_at.year for published_at in published}),
+                country_codes=sorted(country_codes[page.pk]),
+                impact_area_keys=sorted(impact_area_keys[page.pk]),
+                title=page.title,
+                sort_date=published[0] if published else None,
+            )
+        )
+    PageMetadataIndex.objects.bulk_create(
+        entries, batch_size=500, ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0071_pagemetadataindex"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_page_metadata_index, migrations.RunPython.noop, elidable=True
+        ),
+    ]
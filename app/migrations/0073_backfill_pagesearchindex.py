@@ -0,0 +1,59 @@
+# Generated by Django 4.1.3 on 2026-10-18 19:05
+
+from django.db import migrations
+
+
+def backfill_page_search_index(apps, schema_editor):
+    """
+    Index the pages that were live before the index existed, the same way as
+    `app.utils.search.index_page` does on publish.
+    """
+    from app.utils.search import page_taxonomy_text, search_config, search_vector
+    from app.utils.streamfield import html_to_text, page_body_text
+
+    PageSearchIndex = apps.get_model("app", "PageSearchIndex")
+
+    for model in apps.get_app_config("app").get_models():
+        if not any(field.name == "page_ptr" for field in model._meta.fields):
+            continue
+        pages = (
+            model.objects.filter(
+                live=True,
+                content_type__app_label=model._meta.app_label,
+                content_type__model=model._meta.model_name,
+            )
+            .exclude(search_index__isnull=False)
+            .select_related("locale")
+        )
+        entries = [
+            PageSearchIndex(
+                page_id=page.pk,
+                config=search_config(page.locale.language_code),
+                title=page.title,
+                summary=html_to_text(getattr(page, "short_summary", None) or ""),
+                taxonomy=page_taxonomy_text(page),
+                body=page.plain_text
+                if getattr(page, "plain_text", None) is not None
+                else page_body_text(page),
+            )
+            for page in pages.iterator(chunk_size=200)
+        ]
+        PageSearchIndex.objects.bulk_create(
+            entries, batch_size=500, ignore_conflicts=True
+        )
+    PageSearchIndex.objects.filter(search_vector__isnull=True).update(
+        search_vector=search_vector()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0072_backfill_pagemetadataindex"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_page_search_index, migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -1,7 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db.models import MultiPolygonField, PointField
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.db.models import Q
+from django.utils import timezone
 from modelcluster.fields import ParentalKey
 
 
@@ -62,3 +67,225 @@ class User(AbstractUser):
             print(self)
             print(e)
             pass
+
+
+class CountryBoundary(models.Model):
+    """
+    Country outlines from a versioned boundaries dataset, loaded by the
+    `load_country_boundaries` management command so that country geometry
+    and centroids never need a network request.
+    """
+
+    class Meta:
+        ordering = ["name"]
+
+    # Tolerances, in degrees, of the simplified geometries
+    SIMPLIFIED_TOLERANCES = {
+        "geometry_fine": 0.01,
+        "geometry_medium": 0.05,
+        "geometry_coarse": 0.25,
+    }
+
+    isoa2 = models.CharField(max_length=2, unique=True)
+    isoa3 = models.CharField(max_length=3, blank=True)
+    name = models.CharField(max_length=255)
+    geometry = MultiPolygonField()
+    geometry_fine = MultiPolygonField(null=True, blank=True)
+    geometry_medium = MultiPolygonField(null=True, blank=True)
+    geometry_coarse = MultiPolygonField(null=True, blank=True)
+    centroid = PointField(
+        help_text="A point inside the country, suitable for a map marker"
+    )
+    dataset_version = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.isoa2})"
+
+    def simplified_geometry(self, tolerance="medium"):
+        return getattr(self, f"geometry_{tolerance}") or self.geometry
+
+
+class GeocodeJob(models.Model):
+    """
+    A queued request to Nominatim for a page, processed by `run_geocode_jobs`
+    so that saving a page never waits on the network.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="geocodejob_due_idx")
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["page", "kind"],
+                condition=Q(status="pending"),
+                name="unique_pending_geocode_job",
+            )
+        ]
+
+    class Kind(models.TextChoices):
+        # Coordinates to a `geographical_location` name
+        REVERSE = "reverse"
+        # A `geographical_location` name to coordinates
+        FORWARD = "forward"
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    page = models.ForeignKey(
+        "wagtailcore.Page", on_delete=models.CASCADE, related_name="geocode_jobs"
+    )
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    coordinates = PointField(null=True, blank=True)
+    query = models.CharField(max_length=250, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} geocode of page {self.page_id} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, page, kind, coordinates=None, query=""):
+        """
+        Queue a job for a page, replacing any of the same kind that hasn't started yet.
+        """
+        job, _ = cls.objects.update_or_create(
+            page_id=page.pk,
+            kind=kind,
+            status=cls.Status.PENDING,
+            defaults={
+                "coordinates": coordinates,
+                "query": query,
+                "attempts": 0,
+                "run_after": timezone.now(),
+            },
+        )
+        return job
+
+
+class GeocodeCacheEntry(models.Model):
+    """
+    A reverse geocoding result for every point in a grid cell, so that pages
+    in the same place share one Nominatim request. See `app.utils.geo`.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["zoom", "cell_x", "cell_y"], name="unique_geocode_cell"
+            )
+        ]
+        verbose_name_plural = "geocode cache entries"
+
+    class Source(models.TextChoices):
+        NOMINATIM = "nominatim"
+        # Seeded from a location name already on a page
+        PAGE = "page"
+
+    zoom = models.PositiveSmallIntegerField()
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    # Null when Nominatim has nothing for the cell, e.g. in the ocean
+    address = models.TextField(null=True, blank=True)
+    source = models.CharField(
+        max_length=10, choices=Source.choices, default=Source.NOMINATIM
+    )
+    fetched_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+    hits = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.address} (zoom {self.zoom}, cell {self.cell_x},{self.cell_y})"
+
+
+class PageSearchIndex(models.Model):
+    """
+    A weighted full-text search vector for each live page, kept up to date
+    on publish by `app.signals`. See `app.utils.search`.
+    """
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="pagesearchindex_vector_idx")
+        ]
+
+    page = models.OneToOneField(
+        "wagtailcore.Page",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_index",
+    )
+    # The Postgres text search configuration for the page's language
+    config = models.CharField(max_length=32, default="simple")
+    title = models.TextField()
+    summary = models.TextField(blank=True)
+    # Tags, countries and impact areas
+    taxonomy = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    search_vector = SearchVectorField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
+
+
+class PageMetadataIndex(models.Model):
+    """
+    The fields the directory filters and sorts pages by, denormalised into one
+    row per page so that any combination of filters is a single indexed query.
+    Kept up to date on publish by `app.signals`. See `app.utils.page_metadata`.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["path"],
+                name="pagemetadata_path_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+            models.Index(
+                fields=["-sort_date", "-page"], name="pagemetadata_sort_date_idx"
+            ),
+            GinIndex(fields=["years"], name="pagemetadata_years_idx"),
+            GinIndex(fields=["country_codes"], name="pagemetadata_countries_idx"),
+            GinIndex(fields=["impact_area_keys"], name="pagemetadata_impact_areas_idx"),
+        ]
+
+    page = models.OneToOneField(
+        "wagtailcore.Page",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="metadata_index",
+    )
+    content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, related_name="+"
+    )
+    locale = models.ForeignKey(
+        "wagtailcore.Locale", on_delete=models.CASCADE, related_name="+"
+    )
+    translation_key = models.UUIDField(db_index=True)
+    # Copied from the page, for scoping the directory to a section of the tree
+    path = models.CharField(max_length=255)
+    live = models.BooleanField(default=True)
+    # False when the page or one of its ancestors has a view restriction
+    public = models.BooleanField(default=True)
+    # The years the page was first and last published in
+    years = ArrayField(models.PositiveSmallIntegerField(), default=list, blank=True)
+    country_codes = ArrayField(models.CharField(max_length=2), default=list, blank=True)
+    impact_area_keys = ArrayField(models.UUIDField(), default=list, blank=True)
+    title = models.CharField(max_length=255)
+    sort_date = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
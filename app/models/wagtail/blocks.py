@@ -1,15 +1,23 @@
+import hashlib
+import json
 from math import floor
 
 from django.conf import settings
-from django.utils import timezone
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone, translation
+from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 from wagtail import blocks
 from wagtail.core.blocks import StructValue
 from wagtail.images.blocks import ImageChooserBlock
+from wagtail.models import Site
 
+from app.utils.cache import get_generations
+from app.utils.cards import load_cards
 from app.utils.github import github_repo_validator
 from app.utils.hotosm import task_manager_project_url_validator
-from app.utils.wagtail import localized_pages
+from app.utils.wagtail import defer_for_listing, localized_pages
 
 
 class HTMLBlock(blocks.StructBlock):
@@ -269,6 +277,65 @@ class CallToActionGalleryBlock(blocks.StructBlock):
     )
 
 
+# A cache dependency for blocks that render images, bumped when one is saved
+IMAGE_MODEL = settings.WAGTAILIMAGES_IMAGE_MODEL
+
+
+class CachedBlockMixin:
+    """
+    Cache a block's rendered HTML, so hot pages skip both its queries and its template.
+
+    Fragments are keyed by the block's stored value, the active language, the
+    site being served (which page URLs depend on) and the generation of each
+    model in `cache_dependencies`, which is bumped whenever a page of that
+    type is published or unpublished, or an image is saved or deleted.
+    Previews are always rendered fresh.
+    """
+
+    cache_dependencies = ()
+    cache_timeout = 60 * 60 * 24
+
+    def get_cache_key_parts(self, value, context):
+        """
+        Anything else, besides the block's value, that the rendered HTML depends on
+        """
+        return []
+
+    def get_site_root_id(self, context):
+        request = context.get("request") if context is not None else None
+        if request is None:
+            return None
+        site = Site.find_for_request(request)
+        return site.root_page_id if site is not None else None
+
+    def get_render_cache_key(self, value, context):
+        key = json.dumps(
+            [
+                self.get_prep_value(value),
+                translation.get_language(),
+                self.get_site_root_id(context),
+                get_generations([label.lower() for label in self.cache_dependencies]),
+                self.get_cache_key_parts(value, context),
+            ],
+            cls=DjangoJSONEncoder,
+            sort_keys=True,
+        )
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return f"block.{type(self).__module__}.{type(self).__name__}.{digest}"
+
+    def render(self, value, context=None):
+        request = context.get("request") if context is not None else None
+        if getattr(request, "is_preview", False):
+            return super().render(value, context=context)
+
+        key = self.get_render_cache_key(value, context)
+        html = cache.get(key)
+        if html is None:
+            html = str(super().render(value, context=context))
+            cache.set(key, html, self.cache_timeout)
+        return mark_safe(html)
+
+
 class CarouselBlock(blocks.StructBlock):
     class Meta:
         template = "app/blocks/carousel_block.html"
@@ -276,25 +343,34 @@ class CarouselBlock(blocks.StructBlock):
 
     title = blocks.CharBlock(required=True)
 
+    # The image sizes the template renders, loaded along with the pages
+    card_renditions = ("fill-400x260",)
+
+    def load_pages(self, pages):
+        return load_cards(pages, renditions=self.card_renditions, relations=())
+
 
-class LatestArticles(CarouselBlock):
+class LatestArticles(CachedBlockMixin, CarouselBlock):
     class Meta:
         template = "app/blocks/latest_articles.html"
         group = "Related content"
 
+    cache_dependencies = ("app.ArticlePage", "app.MagazineIndexPage", IMAGE_MODEL)
+
     def get_context(self, value, parent_context=None):
         from app.models.wagtail import ArticlePage, MagazineIndexPage
 
         context = super().get_context(value, parent_context=parent_context)
         articles = localized_pages(
-            ArticlePage.objects.all()
+            defer_for_listing(ArticlePage.objects.all())
             .live()
             .public()
-            .order_by("-first_published_at")[:6]
+            .order_by("-first_published_at")[:6],
+            for_listing=True,
         )
 
         context["view_all"] = MagazineIndexPage.objects.live().public().first()
-        context["pages"] = articles
+        context["pages"] = self.load_pages(articles)
         return context
 
 
@@ -315,7 +391,7 @@ class OpenMappingHubs(blocks.StructBlock):
     )
 
 
-class LatestOpportunities(CarouselBlock):
+class LatestOpportunities(CachedBlockMixin, CarouselBlock):
     class Meta:
         template = "app/blocks/latest_opportunities.html"
         group = "Related content"
@@ -330,6 +406,14 @@ class LatestOpportunities(CarouselBlock):
         help_text="This block can show all opportunites across the HOT site, or only those opportunities that are under this page.",
     )
 
+    cache_dependencies = ("app.OpportunityPage", IMAGE_MODEL)
+    card_renditions = ("fill-300x200",)
+
+    def get_cache_key_parts(self, value, context):
+        if value["opportunities_shown"] == "only_children":
+            return [context["page"].id]
+        return []
+
     def get_context(self, value, parent_context=None):
         from app.models.wagtail import MagazineIndexPage, OpportunityPage
 
@@ -337,21 +421,23 @@ class LatestOpportunities(CarouselBlock):
 
         if value["opportunities_shown"] == "show_all":
             opportunities = localized_pages(
-                OpportunityPage.objects.all()
+                defer_for_listing(OpportunityPage.objects.all())
                 .live()
                 .public()
-                .order_by("-first_published_at")[:6]
+                .order_by("-first_published_at")[:6],
+                for_listing=True,
             )
         else:
             opportunities = localized_pages(
-                OpportunityPage.objects.all()
+                defer_for_listing(OpportunityPage.objects.all())
                 .live()
                 .child_of(context["page"])
                 .public()
-                .order_by("-first_published_at")[:6]
+                .order_by("-first_published_at")[:6],
+                for_listing=True,
             )
 
-        context["pages"] = opportunities
+        context["pages"] = self.load_pages(opportunities)
 
         return context
 
@@ -375,12 +461,12 @@ class FeaturedTools(CarouselBlock):
     def get_context(self, value, parent_context=None):
         context = super().get_context(value, parent_context=parent_context)
 
-        context["pages"] = value["tools"]
+        context["pages"] = self.load_pages(value["tools"])
 
         return context
 
 
-class FeaturedProjects(CarouselBlock):
+class FeaturedProjects(CachedBlockMixin, CarouselBlock):
     class Meta:
         help_text = (
             "A block of projects you wish to highlight, presented as a carousel."
@@ -398,10 +484,12 @@ class FeaturedProjects(CarouselBlock):
         help_text="An optional sub-title to display next to the title when displaying projects. Useful for giving context if you are providing a sub-set of projects",
     )
 
+    cache_dependencies = ("app.ProjectPage", IMAGE_MODEL)
+
     def get_context(self, value, parent_context=None):
         context = super().get_context(value, parent_context=parent_context)
 
-        context["pages"] = value["ProjectsChooser"]
+        context["pages"] = self.load_pages(value["ProjectsChooser"])
 
         return context
 
@@ -427,12 +515,12 @@ class FeaturedResources(CarouselBlock):
     def get_context(self, value, parent_context=None):
         context = super().get_context(value, parent_context=parent_context)
 
-        context["pages"] = value["resources"]
+        context["pages"] = self.load_pages(value["resources"])
 
         return context
 
 
-class UpcomingEvents(CarouselBlock):
+class UpcomingEvents(CachedBlockMixin, CarouselBlock):
     class Meta:
         template = "app/blocks/upcoming_events_block.html"
         help_text = "Display a list of upcoming events, presented as a carousel"
@@ -447,6 +535,17 @@ class UpcomingEvents(CarouselBlock):
         help_text="This block can show all events across the HOT site, or only those events that are under this page.",
     )
 
+    cache_dependencies = ("app.EventPage",)
+    # Rendered without images
+    card_renditions = ()
+    # Events drop off the list once they end, without anything being published
+    cache_timeout = 60 * 15
+
+    def get_cache_key_parts(self, value, context):
+        if value["events_shown"] == "only_children":
+            return [context["page"].id]
+        return []
+
     def get_context(self, value, parent_context=None):
         from app.models.wagtail import EventPage
 
@@ -454,23 +553,25 @@ class UpcomingEvents(CarouselBlock):
 
         if value["events_shown"] == "show_all":
             events = localized_pages(
-                EventPage.objects.all()
+                defer_for_listing(EventPage.objects.all())
                 .live()
                 .public()
                 .filter(end_datetime__gte=timezone.now())
-                .order_by("-first_published_at")[:6]
+                .order_by("-first_published_at")[:6],
+                for_listing=True,
             )
         else:
             events = localized_pages(
-                EventPage.objects.all()
+                defer_for_listing(EventPage.objects.all())
                 .live()
                 .child_of(context["page"])
                 .public()
                 .filter(end_datetime__gte=timezone.now())
-                .order_by("-first_published_at")[:6]
+                .order_by("-first_published_at")[:6],
+                for_listing=True,
             )
 
-        context["pages"] = events
+        context["pages"] = self.load_pages(events)
 
         return context
 
@@ -502,7 +603,7 @@ class ResourcesBlock(blocks.StructBlock):
     view_all_link = LinkBlock()
 
 
-class TeamCarouselBlock(blocks.StructBlock):
+class TeamCarouselBlock(CachedBlockMixin, blocks.StructBlock):
     class Meta:
         template = "app/blocks/team_carousel_block.html"
         group = "Related content"
@@ -516,6 +617,8 @@ class TeamCarouselBlock(blocks.StructBlock):
     )
     team = blocks.ListBlock(blocks.PageChooserBlock(page_type="app.PersonPage"))
 
+    cache_dependencies = ("app.PersonPage", IMAGE_MODEL)
+
 
 class PartnerLogos(blocks.StructBlock):
     class Meta:
@@ -547,17 +650,21 @@ class MapBlock(blocks.StructBlock):
         return context
 
 
-class ImpactAreaCarousel(blocks.StructBlock):
+class ImpactAreaCarousel(CachedBlockMixin, blocks.StructBlock):
     class Meta:
         template = "app/blocks/impact_area_carousel.html"
         help_text = "Interactive carousel of all impact areas. Clicking to navigate to the page."
         group = "Related content"
 
+    cache_dependencies = ("app.ImpactAreaPage",)
+
     def get_context(self, value, parent_context=None):
         from app.models.wagtail import ImpactAreaPage
 
         context = super().get_context(value, parent_context=parent_context)
-        impact_areas = localized_pages(ImpactAreaPage.objects.all().live().public())
+        impact_areas = localized_pages(
+            defer_for_listing(ImpactAreaPage.objects.live().public()), for_listing=True
+        )
         context["impact_areas"] = impact_areas
         context["starting_index"] = max(0, floor(len(impact_areas) / 2) - 1)
         return context
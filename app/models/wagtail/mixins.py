@@ -1,12 +1,11 @@
 import json
+from collections import defaultdict
 
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db.models import PointField
-from django.contrib.postgres.search import SearchHeadline, SearchQuery
-from django.core.paginator import Paginator
 from django.db import models
-from django.utils.html import format_html, strip_tags
-from django.utils.safestring import mark_safe
-from django.utils.text import Truncator
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf
 from mapwidgets.widgets import MapboxPointFieldWidget
 from modelcluster.fields import ParentalManyToManyField
 from wagtail import blocks
@@ -24,10 +23,25 @@ from wagtail.search.models import Query
 from wagtailautocomplete.edit_handlers import AutocompletePanel
 
 import app.models.wagtail.blocks as app_blocks
-from app.helpers import concat_html, safe_to_int
-from app.utils.geo import geolocator
+from app.helpers import safe_to_int
+from app.utils.cards import load_cards
+from app.utils.geo import reverse_geocode
 from app.utils.python import ensure_1D_list
-from app.utils.wagtail import localized_related_pages
+from app.utils.richtext import nest_headings
+from app.utils.streamfield import (
+    heading_outline,
+    page_body_text,
+    richtext_html,
+    stream_blocks,
+    summary_text,
+)
+from app.utils.wagtail import (
+    CountingPaginator,
+    distinct_translations,
+    localize_pages,
+    localized_related_pages,
+    model_subclasses,
+)
 
 from .cms import CMSImage
 
@@ -51,25 +65,99 @@ class PreviewablePage(Page):
         blank=True, null=True, help_text="Metadata from the legacy site"
     )
 
+    # Derived from the content on save, so listings don't have to read the StreamField.
+    # `plain_text` is null until they've been derived (see `derive_page_fields`).
+    plain_text = models.TextField(blank=True, null=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    first_image = models.ForeignKey(
+        CMSImage,
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    heading_outline = models.JSONField(default=list, blank=True, editable=False)
+    derived_summary = models.TextField(blank=True, editable=False)
+    # The theme_class of the page or its nearest themed ancestor, see `cascade_theme_class`
+    effective_theme_class = models.CharField(max_length=50, blank=True, editable=False)
+
+    derived_fields = [
+        "plain_text",
+        "word_count",
+        "first_image",
+        "heading_outline",
+        "derived_summary",
+    ]
+
     list_card_template = "app/cards/generic_list_card.html"
 
+    api_fields = [
+        APIField("heading_outline"),
+        APIField("word_count"),
+    ]
+
     @property
     def resolved_theme_class(self):
-        if (
-            hasattr(self, "theme_class")
-            and self.theme_class is not None
-            and len(self.theme_class) > 0
-        ):
+        if getattr(self, "theme_class", None):
             return self.theme_class
-        for nearest_ancestor in reversed(self.get_ancestors()):
-            nearest_ancestor = nearest_ancestor.specific
-            if (
-                hasattr(nearest_ancestor, "theme_class")
-                and nearest_ancestor.theme_class is not None
-                and len(nearest_ancestor.theme_class) > 0
-            ):
-                return nearest_ancestor.theme_class
-        return "theme-blue"
+        if self.effective_theme_class:
+            return self.effective_theme_class
+        return self.inherited_theme_class()
+
+    def inherited_theme_class(self):
+        """
+        The theme of the nearest ancestor that picks one.
+        """
+        themes = (
+            Page.objects.ancestor_of(self)
+            .annotate(theme=page_theme_class())
+            .exclude(theme="")
+            .order_by("-depth")
+            .values_list("theme", flat=True)
+        )
+        return themes.first() or "theme-blue"
+
+    def update_theme_class(self):
+        self.effective_theme_class = (
+            getattr(self, "theme_class", None) or self.inherited_theme_class()
+        )
+
+    def cascade_theme_class(self):
+        """
+        Store this page's theme on the descendants that inherit it, stopping
+        at (and then continuing from) descendants that pick their own.
+        The subtree is read in one query, and written with one update per
+        page type and theme. Returns the number of pages it changed.
+        """
+        pages = (
+            Page.objects.descendant_of(self, inclusive=True)
+            .annotate(theme=page_theme_class())
+            .order_by("path")
+            .values_list("pk", "path", "content_type_id", "theme")
+        )
+        themes = {}
+        groups = defaultdict(list)
+        for pk, path, content_type_id, theme in pages:
+            if path == self.path:
+                theme = self.resolved_theme_class
+            elif not theme:
+                # Parents come first in path order
+                theme = themes[path[: -Page.steplen]]
+            themes[path] = theme
+            groups[content_type_id, theme].append(pk)
+
+        changed = 0
+        for (content_type_id, theme), ids in groups.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if model is None or not issubclass(model, PreviewablePage):
+                continue
+            changed += (
+                model.objects.filter(pk__in=ids)
+                .exclude(effective_theme_class=theme)
+                .update(effective_theme_class=theme)
+            )
+        return changed
 
     @property
     def label(self):
@@ -105,14 +193,9 @@ class PreviewablePage(Page):
         """
         if self.short_summary is not None and len(self.short_summary) > 0:
             return self.short_summary
-        if hasattr(self, "content") and self.content is not None:
-            try:
-                for block in self.content:
-                    if block.block_type == "richtext":
-                        truncator = Truncator(strip_tags(block.value))
-                        return truncator.words(50)
-            except:
-                return None
+        if self.derived_fields_missing():
+            self.update_derived_fields()
+        return self.derived_summary or None
 
     # Methods
     @property
@@ -122,13 +205,81 @@ class PreviewablePage(Page):
         """
         if self.featured_image is not None:
             return self.featured_image
-        if hasattr(self, "content") and self.content is not None:
-            try:
-                for block in self.content:
-                    if block.block_type == "image":
-                        return block.value
-            except:
-                return None
+        if self.derived_fields_missing():
+            self.update_derived_fields()
+        return self.first_image
+
+    @property
+    def table_of_contents(self):
+        """
+        The page's h2-h4 headings as a tree, for rendering a table of contents.
+        """
+        if self.derived_fields_missing():
+            self.update_derived_fields()
+        return nest_headings(self.heading_outline)
+
+    def derived_fields_missing(self):
+        # Listings defer `plain_text`, and rely on `derive_page_fields` having been run
+        return (
+            "plain_text" not in self.get_deferred_fields() and self.plain_text is None
+        )
+
+    @classmethod
+    def listing_deferred_fields(cls):
+        """
+        The columns left out when loading pages for listings: the content,
+        which listings read through the fields derived from it, and legacy metadata.
+        """
+        return [
+            field.name
+            for field in cls._meta.concrete_fields
+            if isinstance(field, StreamField)
+            or field.name in ("frontmatter", "plain_text")
+        ]
+
+    def content_fields(self):
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if isinstance(field, (StreamField, RichTextField))
+        ]
+
+    def update_derived_fields(self):
+        """
+        Recompute the fields derived from the content, without saving them.
+        """
+        content = getattr(self, "content", None)
+        html = richtext_html(content)
+        self.plain_text = page_body_text(self)
+        self.word_count = len(self.plain_text.split())
+        self.heading_outline = heading_outline(html)
+
+        self.first_image = None
+        for value in stream_blocks(content, "image"):
+            if value.get("image") is not None:
+                self.first_image = value["image"]
+                break
+
+        self.derived_summary = ""
+        for value in stream_blocks(content, "richtext"):
+            self.derived_summary = summary_text(value.source)
+            break
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            self.update_derived_fields()
+            self.update_theme_class()
+        else:
+            update_fields = list(update_fields)
+            if set(update_fields) & set(self.content_fields()):
+                self.update_derived_fields()
+                update_fields += self.derived_fields
+            if "theme_class" in update_fields:
+                self.update_theme_class()
+                update_fields.append("effective_theme_class")
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
 
     # Editor
     previewable_page_panels = [
@@ -237,7 +388,6 @@ class ContentSidebarPage(PreviewablePage):
 
 
 class SearchableDirectoryMixin(Page):
-    search_highlight_field = "content"
     per_page = 9
 
     class Meta:
@@ -256,49 +406,44 @@ class SearchableDirectoryMixin(Page):
             query = Query.get(search_query)
             query.add_hit()
 
-            return self.get_queryset().search(search_query)
+            from app.utils.search import search_pages
+
+            return search_pages(self.get_queryset(), search_query)
         else:
             return self.get_queryset()
 
-    def get_search_highlight(self, request, page):
-        if hasattr(page, self.search_highlight_field):
-            highlighter = SearchHeadline(
-                self.search_highlight_field,
-                query=SearchQuery(self.get_search_query(request)),
-                min_words=60,
-                max_words=80,
-                start_sel="<cksearch:hl>",
-                stop_sel="</cksearch:hl>",
-            )
+    def get_search_highlights(self, request, pages):
+        from app.utils.search import search_highlights
 
-            highlights_raw = (
-                type(page)
-                .objects.annotate(search_highlight=highlighter)
-                .get(id=page.id)
-                .search_highlight
-            )
+        search_query = self.get_search_query(request)
+        if not search_query:
+            return {}
+        return search_highlights(pages, search_query)
 
-            highlight_groups = list(
-                hl.split("</cksearch:hl>")
-                for hl in highlights_raw.split("<cksearch:hl>")
-            )
-            start = highlight_groups.pop(0)[0]
+    def get_search_results(self, request, paginator_page):
+        from app.utils.search import search_section
 
-            highlights = tuple(
-                format_html(
-                    '<span class="search-highlight">{}</span>{}',
-                    mark_safe(highlight),
-                    next,
+        pages = localize_pages(paginator_page, for_listing=True)
+        highlights = self.get_search_highlights(request, pages)
+        search_query = self.get_search_query(request)
+        return [
+            {
+                "page": page,
+                "search_highlight": highlights.get(page.pk),
+                "search_section": search_section(
+                    getattr(page, "heading_outline", None), search_query
                 )
-                for highlight, next in highlight_groups
-            )
-
-            return concat_html(start, *highlights)
+                if search_query
+                else None,
+            }
+            for page in pages
+        ]
 
     def get_context(self, request, *args, **kwargs):
         context = super().get_context(request, *args, **kwargs)
-        search_results = list({p.specific.localized for p in self.do_search(request)})
-        paginator = Paginator(search_results, self.per_page)
+        paginator = CountingPaginator(
+            distinct_translations(self.do_search(request)), self.per_page
+        )
         current_page_number = max(
             1, min(paginator.num_pages, safe_to_int(request.GET.get("page"), 1))
         )
@@ -307,16 +452,12 @@ class SearchableDirectoryMixin(Page):
         context.update(
             {
                 "search_query": self.get_search_query(request),
-                "search_results": lambda: [
-                    {
-                        "page": page,
-                        "search_highlight": lambda: self.get_search_highlight(
-                            request, page.specific
-                        ),
-                    }
-                    for page in paginator_page
-                ],
-                "pages": lambda: [page.specific for page in paginator_page],
+                "search_results": lambda: self.get_search_results(
+                    request, paginator_page
+                ),
+                "pages": lambda: load_cards(
+                    localize_pages(paginator_page, for_listing=True)
+                ),
                 "total_count": paginator.count,
                 "paginator_page": paginator_page,
                 "paginator": paginator,
@@ -337,6 +478,12 @@ class GeocodedMixin(Page):
     geographical_location = models.CharField(max_length=250, null=True, blank=True)
     coordinates = PointField(null=True, blank=True)
     related_countries = ParentalManyToManyField("app.CountryPage", blank=True)
+    map_point = PointField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Materialised from coordinates, or else the first related country's centroid",
+    )
 
     @property
     def localized_related_countries(self):
@@ -354,11 +501,12 @@ class GeocodedMixin(Page):
 
     @property
     def centroid(self):
+        """
+        Kept up to date by `refresh_map_point`, see `map_point_expression`
+        """
         if self.coordinates is not None:
             return self.coordinates
-        related_country = self.related_countries.first()
-        if related_country is not None:
-            return related_country.centroid
+        return self.map_point
 
     @property
     def longitude(self):
@@ -386,19 +534,60 @@ class GeocodedMixin(Page):
             return rendition.full_url
 
     def save(self, *args, **kwargs):
-        try:
-            coordinates_changed = self.__previous_coordinates != self.coordinates
-            if self.has_coordinates is True and self.geographical_location is None:
-                self.update_location_name()
-        except:
-            pass
         super().save(*args, **kwargs)
 
+        if self.coordinates is not None and self.geographical_location is None:
+            # Looked up by the `run_geocode_jobs` worker, not during the save
+            from app.models import GeocodeJob
+
+            GeocodeJob.enqueue(
+                self, GeocodeJob.Kind.REVERSE, coordinates=self.coordinates
+            )
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"coordinates", "related_countries"} & set(
+            update_fields
+        ):
+            self.refresh_map_point()
+
+    def refresh_map_point(self):
+        type(self).update_map_points(pk=self.pk)
+        self.refresh_from_db(fields=["map_point"])
+
+    @classmethod
+    def map_point_expression(cls):
+        """
+        SQL for a page's map point: its own coordinates,
+        or else the centroid of its first related country.
+        """
+        field = cls._meta.get_field("related_countries")
+        country = field.m2m_reverse_field_name()
+        first_country_centroid = (
+            field.remote_field.through.objects.filter(
+                **{field.m2m_field_name(): OuterRef("pk")}
+            )
+            .order_by(f"{country}__title")
+            .values(f"{country}__centroid")[:1]
+        )
+        return Coalesce(
+            "coordinates", Subquery(first_country_centroid, output_field=PointField())
+        )
+
+    @classmethod
+    def update_map_points(cls, **filters):
+        """
+        Recalculate the stored map point of matching pages, with one UPDATE per page type.
+        """
+        for model in [cls] if not cls._meta.abstract else model_subclasses(cls):
+            model.objects.filter(**filters).update(
+                map_point=model.map_point_expression()
+            )
+
     def update_location_name(self):
         if self.coordinates is not None:
-            location_data = geolocator.reverse(self.coordinates, zoom=5, exactly_one=1)
-            if location_data is not None:
-                self.geographical_location = location_data.address
+            address = reverse_geocode(self.coordinates)
+            if address is not None:
+                self.geographical_location = address
 
     content_panels = [
         MultiFieldPanel(
@@ -451,6 +640,20 @@ class IconMixin(Page):
     ]
 
 
+def page_theme_class():
+    """
+    The theme a page picks, as an annotation on `Page` querysets, or "" for
+    pages that aren't themeable.
+    """
+    return Coalesce(
+        *[
+            NullIf(f"{model._meta.model_name}__theme_class", Value(""))
+            for model in model_subclasses(ThemeablePageMixin)
+        ],
+        Value(""),
+    )
+
+
 class ThemeablePageMixin(Page):
     class Meta:
         abstract = True
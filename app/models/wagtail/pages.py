@@ -1,12 +1,8 @@
-import json
 import re
 from unicodedata import lookup
 
-import pandas as pd
 import pycountry
-from bs4 import BeautifulSoup
 from django.contrib.gis.db.models import PointField
-from django.contrib.gis.geos import GEOSGeometry, Point
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import Q
@@ -42,8 +38,7 @@ from app.models.wagtail.mixins import (
     SearchableDirectoryMixin,
     ThemeablePageMixin,
 )
-from app.utils.cache import django_cached
-from app.utils.geo import GeolocatorError, geolocator
+from app.utils.richtext import cached_heading_ids
 
 from .cms import CMSImage
 
@@ -79,11 +74,7 @@ def monkey_patch_richtext():
         substitution pass that adds fragment ids and their associated link
         elements to any headings that might be in the rich text content.
         """
-        html = __original__html__(self)
-        soup = BeautifulSoup(html, "lxml")
-        for heading in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
-            heading["id"] = slugify(heading.get_text())
-        return soup.prettify()
+        return cached_heading_ids(__original__html__(self))
 
     # Rebind the RichText's html serialization function such that
     # the output is still entirely functional as far as wagtail
@@ -195,45 +186,24 @@ class CountryPage(ContentPage):
         )
 
     @property
-    @django_cached("country_geocode", get_key=lambda self: self.isoa2)
-    def geo(self):
-        try:
-            x = geolocator.geocode(
-                self.isoa2,
-                exactly_one=True,
-                geometry="geojson",
-                country_codes=self.isoa2.lower(),
-                featuretype="country",
-            )
-            return x
-        except GeolocatorError:
-            pass
+    def boundary(self):
+        from app.models import CountryBoundary
 
-    centroid = PointField(null=True, blank=True)
+        if not self.isoa2:
+            return None
+        return CountryBoundary.objects.filter(isoa2=self.isoa2.upper()).first()
 
-    def save(self, clean=True, user=None, log_action=False, **kwargs):
-        super().save(clean, user, log_action, **kwargs)
-        if self.centroid is None:
-            self.save_centroid()
+    centroid = PointField(null=True, blank=True)
 
-    @classmethod
-    def get_centroids(cls) -> pd.DataFrame:
-        return pd.read_csv(
-            "https://raw.githubusercontent.com/gavinr/world-countries-centroids/master/dist/countries.csv"
-        )
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # For comparison purposes
+        self.__previous_centroid = self.centroid
 
-    def save_centroid(self, df: pd.DataFrame = None):
-        # Special case
-        if self.isoa2 == "TW":
-            self.centroid = Point(120.9605, 23.6978)
-        # Generic case
-        else:
-            if df is None:
-                df = self.__class__.get_centroids()
-            query = df[df["ISO"] == self.isoa2]
-            if query is not None and len(query) > 0:
-                row = query.iloc[0]
-                self.centroid = Point(row["longitude"], row["latitude"])
+    def save_centroid(self):
+        boundary = self.boundary
+        if boundary is not None:
+            self.centroid = boundary.centroid
 
         if self.centroid:
             revision = self.save_revision()
@@ -243,6 +213,13 @@ class CountryPage(ContentPage):
 
     def save(self, clean=True, user=None, log_action=False, **kwargs):
         super().save(clean, user, log_action, **kwargs)
+        if self.centroid != self.__previous_centroid:
+            # Pages without their own coordinates are mapped to this centroid
+            GeocodedMixin.update_map_points(
+                coordinates__isnull=True,
+                related_countries__translation_key=self.translation_key,
+            )
+            self.__previous_centroid = self.centroid
         if self.centroid is None:
             self.save_centroid()
 
@@ -275,9 +252,13 @@ class CountryPage(ContentPage):
         return generic_revision
 
     @property
-    @django_cached("country_geometry", get_key=lambda self: self.isoa2)
     def geometry(self):
-        return GEOSGeometry(json.dumps(self.geo.raw.get("geojson")))
+        boundary = self.boundary
+        return boundary.geometry if boundary is not None else None
+
+    def simplified_geometry(self, tolerance="medium"):
+        boundary = self.boundary
+        return boundary.simplified_geometry(tolerance) if boundary is not None else None
 
     @property
     def emoji_flag(self):
@@ -68,11 +68,13 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "app.middleware.StagingDomainRedirectMiddleware",
+    "app.middleware.RequestCacheMiddleware",
     "livereload.middleware.LiveReloadScript",
     "wagtail.contrib.redirects.middleware.RedirectMiddleware",
     # wagtail-localize
     "django.middleware.locale.LocaleMiddleware",
     "wagtail.contrib.redirects.middleware.RedirectMiddleware",
+    "app.middleware.PageCacheMiddleware",
 ]
 
 ROOT_URLCONF = "app.urls"
@@ -323,12 +325,39 @@ if USE_SILK:
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
-        "LOCATION": "django_cache",
+        # An in-process LRU per worker, in front of the shared database cache
+        "BACKEND": "app.utils.cache_backends.TieredCache",
         "TIMEOUT": None,  # don't expire by default
+        "OPTIONS": {
+            "SHARED": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "django_cache",
+                "OPTIONS": {"MAX_ENTRIES": 10000},
+            },
+            # Kept apart, so that heavy writers don't get generation counters
+            # and locks culled from the table above
+            "STAMPS": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "django_cache_stamps",
+                "OPTIONS": {"MAX_ENTRIES": 50000},
+            },
+            "LOCAL_MAX_ENTRIES": 1000,
+            "LOCAL_TIMEOUT": 60,
+        },
     }
 }
 
+# Full-page cache for anonymous visitors. See app.middleware.PageCacheMiddleware
+
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", False) in (
+    True,
+    "True",
+    "true",
+    "t",
+    1,
+)
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", 60 * 10))
+
 # REST API settings
 
 WAGTAILAPI_LIMIT_MAX = None
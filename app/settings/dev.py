@@ -16,6 +16,8 @@ BASE_URL = "http://localhost:8000"
 
 DATABASES["default"]["CONN_MAX_AGE"] = 0
 
+PAGE_CACHE_ENABLED = False
+
 DEBUG_TOOLBAR_ENABLED = False
 
 if DEBUG_TOOLBAR_ENABLED:
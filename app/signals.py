@@ -0,0 +1,135 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.images import get_image_model
+from wagtail.models import Page, PageViewRestriction
+from wagtail.signals import (
+    page_published,
+    page_slug_changed,
+    page_unpublished,
+    post_page_move,
+)
+
+from app.models import CountryPage
+from app.models.wagtail.mixins import PreviewablePage, ThemeablePageMixin
+from app.utils.cache import bump_generation
+from app.utils.map_feed import invalidate_map_feed, map_page_types, update_map_feed
+from app.utils.page_cache import (
+    page_cache_generation,
+    page_url_paths,
+    purge_page_cache,
+    purge_pages_cache,
+)
+from app.utils.page_metadata import (
+    index_page_metadata,
+    refresh_metadata_paths,
+    refresh_public_flags,
+    unindex_page_metadata,
+)
+from app.utils.search import index_page, unindex_page
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def refresh_map_feed(sender, instance, **kwargs):
+    """
+    Keep the materialised map feed in step with published content.
+    """
+    if issubclass(sender, map_page_types):
+        update_map_feed(instance.translation_key)
+    elif issubclass(sender, CountryPage):
+        # Country centroids are the fallback location for many pages
+        invalidate_map_feed()
+
+
+@receiver(post_delete)
+def drop_deleted_map_page(sender, instance, **kwargs):
+    """
+    Deleting a page doesn't unpublish it first, so take it out of the map feed
+    once the rest of its rows are gone too.
+    """
+    if issubclass(sender, map_page_types):
+        translation_key = instance.translation_key
+        transaction.on_commit(lambda: update_map_feed(translation_key))
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def bump_page_generation(sender, instance, **kwargs):
+    """
+    Expire fragments cached against this page type, see `CachedBlockMixin`
+    """
+    bump_generation(sender._meta.label_lower)
+
+
+@receiver(post_save, sender=get_image_model())
+@receiver(post_delete, sender=get_image_model())
+def bump_image_generation(sender, instance, **kwargs):
+    """
+    Expire fragments that render images, see `CachedBlockMixin`
+    """
+    bump_generation(sender._meta.label_lower)
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def purge_cached_pages(sender, instance, **kwargs):
+    purge_page_cache()
+
+
+@receiver(page_slug_changed)
+def purge_cached_old_url(sender, instance, instance_before, **kwargs):
+    for path in page_url_paths(instance_before):
+        bump_generation(page_cache_generation(path))
+
+
+@receiver(page_published)
+def index_published_page(sender, instance, **kwargs):
+    index_page(instance)
+
+
+@receiver(page_unpublished)
+def unindex_unpublished_page(sender, instance, **kwargs):
+    unindex_page(instance)
+
+
+@receiver(page_published)
+def cascade_published_theme(sender, instance, **kwargs):
+    if issubclass(sender, ThemeablePageMixin):
+        # The pages it changes are purged along with the rest by `purge_cached_pages`
+        instance.cascade_theme_class()
+
+
+@receiver(post_page_move)
+def cascade_moved_theme(sender, instance, **kwargs):
+    page = Page.objects.get(pk=instance.pk).specific
+    if isinstance(page, PreviewablePage):
+        page.update_theme_class()
+        page.save(update_fields=["effective_theme_class"])
+        page.cascade_theme_class()
+        # The whole subtree has new URLs, and may have new themes
+        purge_pages_cache(Page.objects.descendant_of(page, inclusive=True))
+
+
+@receiver(page_published)
+def index_published_page_metadata(sender, instance, **kwargs):
+    index_page_metadata(instance)
+
+
+@receiver(page_unpublished)
+def unindex_unpublished_page_metadata(sender, instance, **kwargs):
+    unindex_page_metadata(instance)
+
+
+@receiver(post_page_move)
+def move_page_metadata(sender, instance, **kwargs):
+    page = Page.objects.get(pk=instance.pk)
+    refresh_metadata_paths(page)
+    # It may have moved into, or out of, a restricted section
+    refresh_public_flags(page)
+
+
+@receiver(post_save, sender=PageViewRestriction)
+@receiver(post_delete, sender=PageViewRestriction)
+def refresh_page_metadata_privacy(sender, instance, **kwargs):
+    refresh_public_flags(instance.page)
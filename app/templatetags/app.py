@@ -5,7 +5,9 @@ from django.http.request import HttpRequest
 from django.urls import translate_url as _translate_url
 from wagtail.models import Page
 
-from app.utils.wagtail import localized_pages as _localized_pages
+from app.utils.wagtail import is_ancestor as _is_ancestor
+from app.utils.wagtail import localize_pages
+from app.utils.wagtail import page_ancestors as _page_ancestors
 
 register = template.Library()
 
@@ -16,13 +18,18 @@ def times(number):
 
 
 def highlighted_in_table_of_content(page: Page, current_page: Page):
-    current_page_lineage = current_page.get_ancestors(inclusive=True)
-    if page.id == current_page.id:
-        return True
-    elif current_page_lineage.filter(id=page.id).exists():
-        return True
-    else:
-        return False
+    return _is_ancestor(page, current_page)
+
+
+@register.simple_tag()
+def page_ancestors(page: Page):
+    """
+    The page's ancestors for breadcrumbs, shared with everything else on the request
+    that needs them.
+
+    e.g. {% page_ancestors page as ancestors %}
+    """
+    return _page_ancestors(page)
 
 
 @register.simple_tag()
@@ -90,4 +97,4 @@ def get_wagtail_locale_codes():
 
 @register.filter()
 def localized_pages(pages):
-    return _localized_pages(pages)
+    return localize_pages(pages)
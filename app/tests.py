@@ -1,9 +1,49 @@
+import time
+
 from django.contrib.auth import get_user_model
 from django.contrib.gis.geos import GEOSGeometry, Point
-from django.test import TestCase
-from wagtail.models import Page
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import translation
+from wagtail.models import Locale, Page, Site
+from wagtail.rich_text import RichText
 
-from app.models.wagtail import CountryPage, PersonPage
+from app.models import GeocodeCacheEntry, GeocodeJob, PageMetadataIndex
+from app.models.wagtail import (
+    ArticlePage,
+    CountryPage,
+    LandingPage,
+    PersonPage,
+    ProjectPage,
+    StaticPage,
+)
+from app.models.wagtail.blocks import IMAGE_MODEL, LatestArticles
+from app.utils.cache import (
+    bump_generation,
+    cached_fn,
+    django_cached,
+    generation_cache_key,
+)
+from app.utils.cache_backends import TieredCache
+from app.utils.cards import load_cards
+from app.utils.country_boundaries import load_country_boundaries
+from app.utils.geo import grid_cell, reverse_geocode
+from app.utils.geocode_jobs import claim_geocode_jobs, run_geocode_job
+from app.utils.map_feed import map_feed_cache_key, update_map_feed
+from app.utils.map_tiles import features_in_tile
+from app.utils.page_cache import page_cache_generation, page_cache_key, page_cache_query
+from app.utils.richtext import add_heading_ids, cached_heading_ids, nest_headings
+from app.utils.search import (
+    format_highlight,
+    search_highlights,
+    search_pages,
+    search_section,
+)
+from app.utils.wagtail import distinct_translations, localize_pages
+from app.views.directory import DirectoryView
+from app.views.search import SearchView
 
 
 class DummyTestCase(TestCase):
@@ -13,6 +53,31 @@ class DummyTestCase(TestCase):
 
 class TestCountryPageCase(TestCase):
     def setUp(self):
+        load_country_boundaries(
+            {
+                "type": "FeatureCollection",
+                "features": [
+                    {
+                        "type": "Feature",
+                        "properties": {
+                            "ISO_A2": "-99",
+                            "ISO_A2_EH": "GB",
+                            "ISO_A3": "GBR",
+                            "NAME": "United Kingdom",
+                            "LABEL_X": -2.1,
+                            "LABEL_Y": 53.9,
+                        },
+                        "geometry": {
+                            "type": "Polygon",
+                            "coordinates": [
+                                [[-6, 50], [2, 50], [2, 59], [-6, 59], [-6, 50]]
+                            ],
+                        },
+                    }
+                ],
+            },
+            "test",
+        )
         self.country = CountryPage(title="United Kingdom", isoa2="GB", isoa3="GBR")
         Page.get_first_root_node().add_child(instance=self.country)
         self.country.save()
@@ -23,6 +88,9 @@ class TestCountryPageCase(TestCase):
     def test_geometry_for_country(self):
         self.assertIsInstance(self.country.geometry, GEOSGeometry)
 
+    def test_centroid_comes_from_boundary(self):
+        self.assertEqual(self.country.centroid.coords, (-2.1, 53.9))
+
 
 class TestAuthorshipSystem(TestCase):
     def create_user_sync_by_full_name(self):
@@ -57,3 +125,650 @@ class TestAuthorshipSystem(TestCase):
             password="oiy9asy98fyq893r87wy",
         )
         self.assertIsNone(user.page)
+
+
+class TestMapFeedCase(TestCase):
+    def setUp(self):
+        self.project = ProjectPage(title="Project 1")
+        Page.get_first_root_node().add_child(instance=self.project)
+        self.project.save_revision().publish()
+
+    def test_feed_contains_published_pages(self):
+        response = self.client.get(reverse("geo-api"))
+        self.assertEqual(response.status_code, 200)
+        ids = [feature["id"] for feature in response.json()["features"]]
+        self.assertIn(self.project.id, ids)
+
+    def test_feed_answers_conditional_requests(self):
+        response = self.client.get(reverse("geo-api"))
+        response = self.client.get(
+            reverse("geo-api"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_feed_updates_on_unpublish(self):
+        self.client.get(reverse("geo-api"))
+        self.project.unpublish()
+        response = self.client.get(reverse("geo-api"))
+        ids = [feature["id"] for feature in response.json()["features"]]
+        self.assertNotIn(self.project.id, ids)
+
+    def test_feed_updates_on_delete(self):
+        self.client.get(reverse("geo-api"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.delete()
+        response = self.client.get(reverse("geo-api"))
+        ids = [feature["id"] for feature in response.json()["features"]]
+        self.assertNotIn(self.project.id, ids)
+
+    def test_contended_updates_rebuild_the_feed(self):
+        self.client.get(reverse("geo-api"))
+        keys = [map_feed_cache_key("en", "lock"), map_feed_cache_key("en", "stale")]
+        self.addCleanup(cache.delete_many, keys)
+        cache.add(keys[0], True)
+        update_map_feed(self.project.translation_key)
+        self.assertIsNone(cache.get(map_feed_cache_key("en", "index")))
+        self.assertTrue(cache.get(keys[1]))
+
+    def test_feed_filters_by_bbox(self):
+        nearby = ProjectPage(title="Project 2", coordinates=Point(1, 1))
+        Page.get_first_root_node().add_child(instance=nearby)
+        nearby.save_revision().publish()
+        faraway = ProjectPage(title="Project 3", coordinates=Point(50, 50))
+        Page.get_first_root_node().add_child(instance=faraway)
+        faraway.save_revision().publish()
+
+        response = self.client.get(reverse("geo-api"), {"bbox": "0,0,2,2"})
+        ids = [feature["id"] for feature in response.json()["features"]]
+        self.assertEqual(ids, [nearby.id])
+
+    def test_feed_rejects_bad_bbox(self):
+        response = self.client.get(reverse("geo-api"), {"bbox": "0,0,2"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_tiles_are_served_for_valid_coordinates_only(self):
+        response = self.client.get(reverse("geo-tiles", args=(0, 0, 0)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.mapbox-vector-tile")
+        response = self.client.get(reverse("geo-tiles", args=(1, 2, 0)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_tiles_are_cut_from_the_feed(self):
+        nearby = ProjectPage(title="Project 2", coordinates=Point(1, 1))
+        Page.get_first_root_node().add_child(instance=nearby)
+        nearby.save_revision().publish()
+
+        # At zoom 4, tile 8/7 spans 0-22.5°E, 0-22°N and tile 0/0 the far north-west
+        self.assertEqual(
+            [feature["id"] for feature in features_in_tile(4, 8, 7)], [nearby.id]
+        )
+        self.assertEqual(features_in_tile(4, 0, 0), [])
+
+
+class TestMapPointCase(TestCase):
+    def setUp(self):
+        self.country = CountryPage(
+            title="United Kingdom", isoa2="GB", centroid=Point(-2, 54)
+        )
+        Page.get_first_root_node().add_child(instance=self.country)
+        self.project = ProjectPage(title="Project")
+        Page.get_first_root_node().add_child(instance=self.project)
+        self.project.related_countries.add(self.country)
+        self.project.save()
+
+    def test_map_point_falls_back_to_country_centroid(self):
+        self.assertEqual(self.project.map_point.coords, (-2, 54))
+
+    def test_map_point_prefers_coordinates(self):
+        self.project.coordinates = Point(1, 1)
+        self.project.save()
+        self.assertEqual(self.project.map_point.coords, (1, 1))
+
+    def test_map_point_follows_country_centroid(self):
+        self.country.centroid = Point(0, 51)
+        self.country.save()
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.map_point.coords, (0, 51))
+
+
+class TestLocalizePagesCase(TestCase):
+    def setUp(self):
+        self.french = Locale.objects.create(language_code="fr")
+        self.project = ProjectPage(title="Project")
+        Page.get_first_root_node().add_child(instance=self.project)
+        self.project.save_revision().publish()
+        self.translation = self.project.copy_for_translation(self.french)
+        self.translation.save_revision().publish()
+        self.untranslated = PersonPage(title="Person")
+        Page.get_first_root_node().add_child(instance=self.untranslated)
+        self.untranslated.save_revision().publish()
+
+    def test_pages_are_swapped_for_live_translations(self):
+        with translation.override("fr"):
+            pages = localize_pages(
+                [Page.objects.get(pk=self.project.pk), self.untranslated]
+            )
+        self.assertEqual(pages, [self.translation, self.untranslated])
+        self.assertIsInstance(pages[0], ProjectPage)
+
+    def test_duplicate_translations_are_removed(self):
+        with translation.override("fr"):
+            pages = localize_pages([self.project, self.translation])
+        self.assertEqual(pages, [self.translation])
+
+
+class TestLocalizedRelatedPagesCase(TestCase):
+    def setUp(self):
+        self.french = Locale.objects.create(language_code="fr")
+        self.uk = CountryPage(
+            title="United Kingdom", isoa2="GB", centroid=Point(-2, 54)
+        )
+        self.france = CountryPage(title="France", isoa2="FR", centroid=Point(2, 46))
+        for country in (self.uk, self.france):
+            Page.get_first_root_node().add_child(instance=country)
+            country.save_revision().publish()
+        self.project = ProjectPage(title="Project")
+        Page.get_first_root_node().add_child(instance=self.project)
+        self.project.related_countries.add(self.uk)
+        self.project.save_revision().publish()
+        self.translation = self.project.copy_for_translation(self.french)
+        self.translation.related_countries.set([self.france])
+        self.translation.save_revision().publish()
+
+    def test_relations_of_every_translation_are_collected(self):
+        self.assertEqual(
+            self.project.localized_related_countries, [self.france, self.uk]
+        )
+        self.assertEqual(
+            self.translation.localized_related_countries, [self.france, self.uk]
+        )
+
+    def test_distinct_translations_prefers_the_active_locale(self):
+        projects = ProjectPage.objects.live()
+        with translation.override("fr"):
+            self.assertEqual(list(distinct_translations(projects)), [self.translation])
+        english = Locale.objects.get(language_code="en")
+        self.assertEqual(list(distinct_translations(projects, english)), [self.project])
+
+
+class TestCachedBlockCase(TestCase):
+    def publish_article(self, title):
+        article = ArticlePage(title=title)
+        Page.get_first_root_node().add_child(instance=article)
+        article.save_revision().publish()
+        return article
+
+    def test_fragment_is_refreshed_on_publish(self):
+        block = LatestArticles()
+        value = block.to_python({"title": "News"})
+        self.publish_article("First article")
+        self.assertIn("First article", block.render(value, {}))
+
+        self.publish_article("Second article")
+        self.assertIn("Second article", block.render(value, {}))
+
+    def test_fragments_with_images_expire_when_an_image_is_saved(self):
+        block = LatestArticles()
+        value = block.to_python({"title": "News"})
+        key = block.get_render_cache_key(value, {})
+        bump_generation(IMAGE_MODEL.lower())
+        self.assertNotEqual(key, block.get_render_cache_key(value, {}))
+
+
+class TestPageCacheCase(TestCase):
+    def test_tracking_params_are_ignored(self):
+        self.assertEqual(
+            page_cache_query(QueryDict("utm_source=x&page=2&fbclid=y&country=GB")),
+            "country=GB&page=2",
+        )
+
+    def test_publishing_purges_every_page(self):
+        root = Site.objects.get(is_default_site=True).root_page
+        project = ProjectPage(title="Project", slug="project")
+        root.add_child(instance=project)
+        project.save_revision().publish()
+        other = StaticPage(title="Other", slug="other")
+        root.add_child(instance=other)
+        other.save_revision().publish()
+
+        urls = [page.get_url_parts()[2] for page in (project, root, other)]
+        factory = RequestFactory()
+        keys = [page_cache_key(factory.get(url)) for url in urls]
+
+        project.save_revision().publish()
+        for url, key in zip(urls, keys):
+            self.assertNotEqual(key, page_cache_key(factory.get(url)))
+
+    def test_unknown_paths_store_no_generation(self):
+        page_cache_key(RequestFactory().get("/no/such/page/"))
+        self.assertIsNone(
+            cache.get(generation_cache_key(page_cache_generation("/no/such/page/")))
+        )
+
+
+class TestTieredCacheCase(SimpleTestCase):
+    def make_worker(self):
+        return TieredCache(
+            "",
+            {
+                "TIMEOUT": None,
+                "OPTIONS": {
+                    "SHARED": {
+                        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                        "LOCATION": "tiered-cache-tests",
+                    },
+                    "REVALIDATE_INTERVAL": 0,
+                },
+            },
+        )
+
+    def setUp(self):
+        self.worker, self.other_worker = self.make_worker(), self.make_worker()
+        self.worker.clear()
+
+    def test_reads_are_served_locally(self):
+        self.worker.set("key", "value")
+        self.assertEqual(self.worker.get("key"), "value")
+        self.assertEqual(self.worker.stats()["local_hits"], 1)
+
+    def test_writes_invalidate_other_workers(self):
+        self.worker.set("key", "old")
+        self.assertEqual(self.other_worker.get("key"), "old")
+        self.worker.set("key", "new")
+        self.assertEqual(self.other_worker.get("key"), "new")
+        self.worker.delete("key")
+        self.assertIsNone(self.other_worker.get("key"))
+
+    def test_adds_invalidate_other_workers(self):
+        self.worker.set("lock", "old")
+        self.assertEqual(self.other_worker.get("lock"), "old")
+        # As if it had expired, without a log entry
+        self.worker.shared.delete("lock")
+        self.assertTrue(self.worker.add("lock", "new"))
+        self.assertEqual(self.other_worker.get("lock"), "new")
+
+    def test_culled_stamps_invalidate_local_copies(self):
+        self.worker.set("key", "old")
+        self.assertEqual(self.other_worker.get("key"), "old")
+        self.worker.shared.set("key", "new")
+        self.worker.stamps.delete(self.worker._stamp_key(self.worker.make_key("key")))
+        self.assertEqual(self.other_worker.get("key"), "new")
+
+    def test_stats_are_logged(self):
+        self.worker.stats_log_interval = 0
+        with self.assertLogs("app.utils.cache_backends", "INFO") as logs:
+            self.worker.get("key")
+        self.assertIn("misses", logs.output[0])
+
+    def test_local_copies_expire_with_the_shared_entry(self):
+        self.worker.set("key", "value", 0.1)
+        self.assertEqual(self.other_worker.get("key"), "value")
+        time.sleep(0.2)
+        self.assertIsNone(self.other_worker.get("key"))
+
+    def test_incr_invalidates_other_workers(self):
+        self.worker.set("counter", 1)
+        self.assertEqual(self.other_worker.get("counter"), 1)
+        self.worker.incr("counter")
+        self.assertEqual(self.other_worker.get("counter"), 2)
+
+
+class TestCachedFunctionsCase(TestCase):
+    def test_none_results_are_cached(self):
+        calls = []
+
+        @django_cached("test_none_results", get_key=lambda n: n)
+        def lookup(n):
+            calls.append(n)
+            return None
+
+        self.assertIsNone(lookup(1))
+        self.assertIsNone(lookup(1))
+        self.assertEqual(calls, [1])
+
+    def test_cached_fn_returns_results(self):
+        @cached_fn("test_cached_fn")
+        def answer():
+            return 42
+
+        self.assertEqual(answer(), 42)
+
+    def test_cached_functions_can_call_each_other(self):
+        @django_cached("test_inner", get_key=lambda n: n)
+        def inner(n):
+            return n * 2
+
+        @django_cached("test_outer", get_key=lambda n: n)
+        def outer(n):
+            return inner(n) + 1
+
+        self.assertEqual([outer(n) for n in range(100)], list(range(1, 200, 2)))
+
+    def test_exceptions_are_raised(self):
+        @django_cached("test_exceptions")
+        def broken():
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            broken()
+
+
+class TestGeocodeJobCase(TestCase):
+    def setUp(self):
+        self.project = ProjectPage(title="Project", coordinates=Point(1, 1))
+        Page.get_first_root_node().add_child(instance=self.project)
+
+    def test_saving_queues_a_reverse_geocode(self):
+        self.project.save()
+        jobs = GeocodeJob.objects.filter(page=self.project)
+        self.assertEqual(jobs.count(), 1)
+        self.assertEqual(jobs.get().kind, GeocodeJob.Kind.REVERSE)
+        self.assertIsNone(
+            ProjectPage.objects.get(pk=self.project.pk).geographical_location
+        )
+
+    def test_claimed_jobs_are_not_claimed_twice(self):
+        self.assertEqual(len(claim_geocode_jobs()), 1)
+        self.assertEqual(len(claim_geocode_jobs()), 0)
+
+    def test_geocoded_names_are_kept_by_the_next_publish(self):
+        revision = self.project.save_revision()
+        cell_x, cell_y = grid_cell(Point(1, 1), 5)
+        GeocodeCacheEntry.objects.create(
+            zoom=5, cell_x=cell_x, cell_y=cell_y, address="Gulf of Guinea"
+        )
+        for job in claim_geocode_jobs():
+            run_geocode_job(job)
+        revision.refresh_from_db()
+        revision.publish()
+        self.assertEqual(
+            ProjectPage.objects.get(pk=self.project.pk).geographical_location,
+            "Gulf of Guinea",
+        )
+
+
+class TestGeocodeCacheCase(TestCase):
+    def test_nearby_points_share_a_cached_name(self):
+        cell_x, cell_y = grid_cell(Point(-0.12, 51.52), 5)
+        GeocodeCacheEntry.objects.create(
+            zoom=5, cell_x=cell_x, cell_y=cell_y, address="London, England"
+        )
+        self.assertEqual(reverse_geocode(Point(-0.13, 51.54)), "London, England")
+        self.assertEqual(GeocodeCacheEntry.objects.get().hits, 1)
+
+
+class TestSearchIndexCase(TestCase):
+    def setUp(self):
+        self.project = ProjectPage(
+            title="Flood mapping", short_summary="<p>Mapping rivers</p>"
+        )
+        Page.get_first_root_node().add_child(instance=self.project)
+        self.project.save_revision().publish()
+        self.other = ProjectPage(title="Road mapping")
+        Page.get_first_root_node().add_child(instance=self.other)
+        self.other.save_revision().publish()
+
+    def test_published_pages_are_searchable(self):
+        results = search_pages(Page.objects.live(), "flood", "en")
+        self.assertEqual([page.pk for page in results], [self.project.pk])
+
+    def test_title_matches_rank_first(self):
+        results = search_pages(Page.objects.live(), "mapping rivers", "en")
+        self.assertEqual(results.first().pk, self.project.pk)
+
+    def test_highlights_are_fetched_for_a_page_of_results(self):
+        with self.assertNumQueries(1):
+            highlights = search_highlights([self.project, self.other], "rivers", "en")
+        self.assertIn(
+            '<span class="search-highlight">rivers</span>', highlights[self.project.pk]
+        )
+
+    def test_highlights_are_escaped(self):
+        self.assertEqual(
+            format_highlight("a <b> <cksearch:hl>map</cksearch:hl> c"),
+            'a &lt;b&gt; <span class="search-highlight">map</span> c',
+        )
+
+    def test_results_link_to_the_matching_section(self):
+        outline = [
+            {"level": 2, "text": "Introduction", "id": "introduction"},
+            {"level": 2, "text": "Flood maps", "id": "flood-maps"},
+        ]
+        self.assertEqual(search_section(outline, "flood -roads"), "flood-maps")
+        self.assertIsNone(search_section(outline, "roads"))
+
+    def test_unpublished_pages_are_removed(self):
+        self.project.unpublish()
+        results = search_pages(Page.objects.all(), "flood", "en")
+        self.assertEqual(results.count(), 0)
+
+    def test_search_view_lists_highlighted_results(self):
+        view = SearchView()
+        view.request = RequestFactory().get("/", {"query": "rivers"})
+        context = view.get_context_data()
+        self.assertNotIn("pages", context)
+        results = context["search_results"]()
+        self.assertEqual([result["page"].pk for result in results], [self.project.pk])
+        self.assertIn("search-highlight", results[0]["search_highlight"])
+
+    def test_pages_are_matched_in_their_own_language(self):
+        french = Locale.objects.create(language_code="fr")
+        page = ProjectPage(title="Chevaux sauvages", locale=french)
+        Page.get_first_root_node().add_child(instance=page)
+        page.save_revision().publish()
+        with translation.override("en"):
+            results = search_pages(Page.objects.live(), "chevaux")
+        self.assertEqual([result.pk for result in results], [page.pk])
+
+
+class TestDerivedPageFieldsCase(TestCase):
+    def setUp(self):
+        self.page = StaticPage(
+            title="Guide",
+            content=[
+                (
+                    "richtext",
+                    RichText(
+                        "<h2>Getting started</h2><p>Map the roads &amp; rivers</p>"
+                    ),
+                )
+            ],
+        )
+        Page.get_first_root_node().add_child(instance=self.page)
+
+    def test_fields_are_derived_on_save(self):
+        page = StaticPage.objects.get(pk=self.page.pk)
+        self.assertEqual(page.plain_text, "Getting started\nMap the roads & rivers")
+        self.assertEqual(page.word_count, 7)
+        self.assertEqual(
+            page.heading_outline,
+            [{"level": 2, "text": "Getting started", "id": "getting-started"}],
+        )
+        self.assertEqual(page.summary, "Getting started Map the roads &amp; rivers")
+        self.assertIsNone(page.image)
+
+    def test_listings_read_derived_fields_without_the_content(self):
+        [page] = localize_pages(Page.objects.filter(pk=self.page.pk), for_listing=True)
+        self.assertIn("content", page.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.assertEqual(page.summary, "Getting started Map the roads &amp; rivers")
+
+    def test_draft_content_is_not_derived(self):
+        self.page.content = [("richtext", RichText("<p>Draft</p>"))]
+        self.page.save_revision()
+        page = StaticPage.objects.get(pk=self.page.pk)
+        self.assertEqual(page.word_count, 7)
+
+
+class TestHeadingIdsCase(SimpleTestCase):
+    def test_headings_are_given_ids(self):
+        self.assertEqual(
+            add_heading_ids(
+                '<h2 id="old" class="x">Roads &amp; <b>Rivers</b></h2><p>Text</p>'
+            ),
+            '<h2 class="x" id="roads-rivers">Roads &amp; <b>Rivers</b></h2><p>Text</p>',
+        )
+
+    def test_rewritten_html_is_cached(self):
+        html = "<h3>Cached</h3>"
+        self.assertIs(cached_heading_ids(html), cached_heading_ids(html))
+
+    def test_outline_is_nested_for_the_table_of_contents(self):
+        outline = [
+            {"level": 2, "text": "A", "id": "a"},
+            {"level": 3, "text": "B", "id": "b"},
+            {"level": 5, "text": "Skipped", "id": "skipped"},
+            {"level": 2, "text": "C", "id": "c"},
+        ]
+        self.assertEqual(
+            [
+                (node["id"], [child["id"] for child in node["children"]])
+                for node in nest_headings(outline)
+            ],
+            [("a", ["b"]), ("c", [])],
+        )
+
+
+class TestThemeClassCase(TestCase):
+    def setUp(self):
+        self.landing = LandingPage(title="Landing", theme_class="theme-red")
+        Page.get_first_root_node().add_child(instance=self.landing)
+        self.child = StaticPage(title="Child")
+        self.landing.add_child(instance=self.child)
+
+    def test_theme_is_inherited_on_save(self):
+        child = StaticPage.objects.get(pk=self.child.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(child.resolved_theme_class, "theme-red")
+
+    def test_theme_cascades_on_publish(self):
+        self.landing.theme_class = "theme-green"
+        self.landing.save_revision().publish()
+        child = StaticPage.objects.get(pk=self.child.pk)
+        self.assertEqual(child.effective_theme_class, "theme-green")
+
+    def test_cascade_returns_the_pages_it_changed(self):
+        self.landing.theme_class = "theme-green"
+        self.assertEqual(self.landing.cascade_theme_class(), 2)
+        self.assertEqual(self.landing.cascade_theme_class(), 0)
+
+    def test_nearest_themed_ancestor_wins(self):
+        section = LandingPage(title="Section", theme_class="theme-teal")
+        self.landing.add_child(instance=section)
+        page = StaticPage(title="Page")
+        section.add_child(instance=page)
+        self.assertEqual(page.inherited_theme_class(), "theme-teal")
+
+        self.landing.theme_class = "theme-green"
+        self.landing.cascade_theme_class()
+        self.assertEqual(
+            StaticPage.objects.get(pk=page.pk).effective_theme_class, "theme-teal"
+        )
+        self.assertEqual(
+            StaticPage.objects.get(pk=self.child.pk).effective_theme_class,
+            "theme-green",
+        )
+
+
+class TestCardLoaderCase(TestCase):
+    def setUp(self):
+        self.country = CountryPage(title="Nepal", isoa2="NP", centroid=Point(84, 28))
+        Page.get_first_root_node().add_child(instance=self.country)
+        for title in ("First project", "Second project"):
+            project = ProjectPage(title=title)
+            Page.get_first_root_node().add_child(instance=project)
+            project.related_countries.add(self.country)
+            project.save()
+
+    def test_relations_are_loaded_in_bulk(self):
+        pages = list(ProjectPage.objects.all())
+        with self.assertNumQueries(2):
+            load_cards(pages)
+        with self.assertNumQueries(0):
+            for page in pages:
+                self.assertEqual(list(page.related_countries.all()), [self.country])
+
+
+class TestPageMetadataIndexCase(TestCase):
+    def setUp(self):
+        self.country = CountryPage(title="Nepal", isoa2="NP", centroid=Point(84, 28))
+        Page.get_first_root_node().add_child(instance=self.country)
+        self.country.save_revision().publish()
+        self.project = ProjectPage(title="Kathmandu mapping")
+        Page.get_first_root_node().add_child(instance=self.project)
+        self.project.related_countries.add(self.country)
+        self.project.save_revision().publish()
+
+    def directory_results(self, **params):
+        view = DirectoryView()
+        view.request = RequestFactory().get("/", params)
+        return [page.pk for page in view.do_search()]
+
+    def test_published_pages_are_indexed(self):
+        index = PageMetadataIndex.objects.get(page=self.project)
+        self.assertEqual(index.country_codes, ["NP"])
+        self.assertEqual(index.years, [self.project.first_published_at.year])
+
+    def test_directory_filters_use_the_index(self):
+        self.assertEqual(self.directory_results(country="np"), [self.project.pk])
+        self.assertEqual(self.directory_results(country="GB"), [])
+        self.assertEqual(self.directory_results(year="not a year"), [self.project.pk])
+
+    def test_unpublished_pages_leave_the_directory(self):
+        self.project.unpublish()
+        self.assertEqual(self.directory_results(type="projects"), [])
+
+    def test_directory_pages_by_cursor(self):
+        for title in ("Pokhara mapping", "Lalitpur mapping"):
+            page = ProjectPage(title=title)
+            Page.get_first_root_node().add_child(instance=page)
+            page.save_revision().publish()
+
+        view = DirectoryView()
+        view.per_page = 2
+        view.request = RequestFactory().get("/", {"type": "projects"})
+        _, first = view.paginate(view.do_search())
+        self.assertEqual(len(first), 2)
+        self.assertFalse(first.has_previous())
+
+        view.request = RequestFactory().get(
+            "/",
+            {"type": "projects", "after": first.next_cursor},
+            HTTP_TURBO_FRAME=f"directory-page-{first.next_cursor}",
+        )
+        self.assertTrue(view.is_append_request())
+        _, second = view.paginate(view.do_search())
+        self.assertEqual(len(second), 1)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            {page.pk for page in [*first, *second]},
+            set(ProjectPage.objects.values_list("pk", flat=True)),
+        )
+
+        view.request = RequestFactory().get("/", {"after": "not a cursor"})
+        _, page = view.paginate(view.do_search())
+        self.assertEqual(page.cursor, None)
+
+    def test_directory_responses_vary_on_turbo_frame(self):
+        view = DirectoryView()
+        view.request = RequestFactory().get("/")
+        self.assertIn("Turbo-Frame", view.render_to_response({})["Vary"])
+
+    def test_directory_counts_facets(self):
+        view = DirectoryView()
+        view.request = RequestFactory().get("/", {"type": "projects", "year": "2001"})
+        counts = view.get_facet_counts()
+        self.assertEqual(
+            set(counts), {"total", "type", "year", "impact_area", "country"}
+        )
+        self.assertEqual(set(counts["type"]), set(DirectoryView.page_types))
+        for url_param in ("year", "impact_area", "country"):
+            self.assertEqual(
+                set(counts[url_param]),
+                {option["value"] for option in view.filter_options[url_param]},
+            )
+        self.assertEqual(counts["total"], 0)
+        # Each facet ignores its own filter, but not the others
+        self.assertEqual(counts["year"][str(self.project.first_published_at.year)], 1)
+        self.assertEqual(counts["country"]["NP"], 0)
+        self.assertEqual(counts["type"]["projects"], 0)
@@ -60,6 +60,11 @@ urlpatterns = [
 
 urlpatterns += i18n_patterns(
     path("api/geo/", MapSearchViewset.as_view({"get": "list"}), name="geo-api"),
+    path(
+        "api/geo/tiles/<int:z>/<int:x>/<int:y>.mvt",
+        MapSearchViewset.as_view({"get": "tile"}),
+        name="geo-tiles",
+    ),
     path("search/", SearchView.as_view(), name="search"),
     path(
         "frames/search/",
@@ -1,6 +1,17 @@
-from django.core.cache import cache
+import functools
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.core.cache import cache, caches
+from django.db import connections
 from django.db.models import QuerySet
 
+logger = logging.getLogger(__name__)
+
 
 def django_cached_key(ns, get_key, *args, **kwargs):
     key = ns
@@ -9,20 +20,203 @@ def django_cached_key(ns, get_key, *args, **kwargs):
     return key
 
 
-def django_cached(ns, get_key=None, ttl=500):
+class CacheMetrics:
+    """
+    Per-namespace hit, miss and latency counts for this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: defaultdict(float))
+
+    def record(self, ns, event, seconds=None):
+        with self._lock:
+            self._counts[ns][event] += 1
+            if seconds is not None:
+                self._counts[ns]["compute_seconds"] += seconds
+
+    def stats(self):
+        with self._lock:
+            return {ns: dict(counts) for ns, counts in self._counts.items()}
+
+
+cache_metrics = CacheMetrics()
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _key_lock(key):
+    """
+    A re-entrant lock for one key in this process, created on demand and
+    dropped once no thread holds or waits for it.
+    """
+    with _key_locks_guard:
+        lock, users = _key_locks.get(key, (None, 0))
+        if lock is None:
+            lock = threading.RLock()
+        _key_locks[key] = (lock, users + 1)
+    try:
+        with lock:
+            yield
+    finally:
+        with _key_locks_guard:
+            lock, users = _key_locks[key]
+            if users == 1:
+                del _key_locks[key]
+            else:
+                _key_locks[key] = (lock, users - 1)
+
+
+def _compute(ns, fn, args, kwargs):
+    started = time.monotonic()
+    try:
+        value = fn(*args, **kwargs)
+    except Exception:
+        cache_metrics.record(ns, "errors")
+        raise
+    cache_metrics.record(ns, "computes", time.monotonic() - started)
+    if isinstance(value, QuerySet):
+        # Caching a QuerySet does _not_ do what you might think it does!
+        value = tuple(value)
+    return value
+
+
+def _store(backend, key, value, options):
+    """
+    Wrap a value with its (jittered) freshness deadline. The cache entry itself
+    outlives that deadline by `stale_ttl`, so it can be served while refreshing.
+    """
+    ttl = options["negative_ttl"] if value is None else options["ttl"]
+    if ttl is None:
+        backend.set(key, {"value": value, "fresh_until": None}, None)
+        return
+    jitter = options["jitter"]
+    ttl = ttl * random.uniform(1 - jitter, 1 + jitter)
+    backend.set(
+        key,
+        {"value": value, "fresh_until": time.time() + ttl},
+        ttl + options["stale_ttl"],
+    )
+
+
+def _read(backend, key):
+    entry = backend.get(key)
+    # Ignore anything cached before values were wrapped
+    if isinstance(entry, dict) and "fresh_until" in entry:
+        return entry
+    return None
+
+
+def _is_fresh(entry):
+    return entry["fresh_until"] is None or entry["fresh_until"] > time.time()
+
+
+def _refresh_in_background(ns, backend, key, fn, args, kwargs, options):
+    lock_key = f"{key}.lock"
+    if not backend.add(lock_key, True, options["lock_timeout"]):
+        # Someone else is already refreshing it
+        return
+
+    def refresh():
+        try:
+            _store(backend, key, _compute(ns, fn, args, kwargs), options)
+        except Exception:
+            logger.exception("Couldn't refresh cached value %s", key)
+        finally:
+            backend.delete(lock_key)
+            connections.close_all()
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def _compute_and_store(ns, backend, key, fn, args, kwargs, options, stale_entry):
+    try:
+        value = _compute(ns, fn, args, kwargs)
+    except Exception:
+        if stale_entry is not None:
+            logger.exception("Serving stale cached value %s", key)
+            return stale_entry["value"]
+        raise
+    _store(backend, key, value, options)
+    return value
+
+
+def _get_or_compute(ns, backend, key, fn, args, kwargs, options):
+    entry = _read(backend, key)
+    if entry is not None:
+        if _is_fresh(entry):
+            cache_metrics.record(ns, "hits")
+            return entry["value"]
+        if options["stale_ttl"]:
+            cache_metrics.record(ns, "stale_hits")
+            _refresh_in_background(ns, backend, key, fn, args, kwargs, options)
+            return entry["value"]
+
+    cache_metrics.record(ns, "misses")
+    # Single flight: one process per cache holds the shared lock and computes
+    # the value, while its other threads queue on a local lock for the key
+    lock_key = f"{key}.lock"
+    deadline = time.monotonic() + options["lock_timeout"]
+    while True:
+        with _key_lock(key):
+            latest = _read(backend, key)
+            if latest is not None and _is_fresh(latest):
+                return latest["value"]
+            if backend.add(lock_key, True, options["lock_timeout"]):
+                try:
+                    return _compute_and_store(
+                        ns, backend, key, fn, args, kwargs, options, entry
+                    )
+                finally:
+                    backend.delete(lock_key)
+
+        # Another process is computing it: wait, without holding up this one
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(0.1)
+
+    return _compute_and_store(ns, backend, key, fn, args, kwargs, options, entry)
+
+
+def django_cached(
+    ns,
+    get_key=None,
+    ttl=500,
+    stale_ttl=0,
+    negative_ttl=60,
+    jitter=0.1,
+    lock_timeout=30,
+    cache_alias="default",
+):
+    """
+    Memoise a function in the Django cache.
+
+    - `None` results are cached too, for `negative_ttl` seconds
+    - Concurrent misses for the same key are computed once, across processes
+    - Values are served for up to `stale_ttl` seconds past `ttl` while being
+      refreshed in the background
+    - TTLs are spread by +/- `jitter` so entries don't all expire at once
+    - Exceptions are raised, unless there is a stale value to fall back on
+
+    Hit, miss and compute time counts are kept in `cache_metrics`.
+    """
+    options = {
+        "ttl": ttl,
+        "stale_ttl": stale_ttl,
+        "negative_ttl": negative_ttl,
+        "jitter": jitter,
+        "lock_timeout": lock_timeout,
+    }
+
     def decorator(fn):
+        @functools.wraps(fn)
         def cached_fn(*args, **kwargs):
             key = django_cached_key(ns, get_key, *args, **kwargs)
-
-            hit = cache.get(key)
-            if hit is None:
-                hit = fn(*args, **kwargs)
-                if isinstance(hit, QuerySet):
-                    # Caching a QuerySet does _not_ do what you might think it does!
-                    hit = tuple(hit)
-                cache.set(key, hit, ttl)
-
-            return hit
+            return _get_or_compute(
+                ns, caches[cache_alias], key, fn, args, kwargs, options
+            )
 
         return cached_fn
 
@@ -33,22 +227,72 @@ def django_cached_model(ns, ttl=500):
     return django_cached(ns, lambda self: self.id, ttl)
 
 
+def generation_cache_key(name):
+    return f"generation.{name}"
+
+
+def get_generations(names, create=True):
+    """
+    Current generation counters for a set of names, e.g. model labels.
+
+    A missing counter (never bumped, or culled from the cache) is started
+    from the clock rather than zero, so it can't collide with a generation
+    that was already used to key cached values.
+
+    Pass `create=False` for names that come from outside, such as request
+    paths. Their missing counters are read as zero and only stored once
+    they're bumped, so that probing URLs can't fill the cache with them.
+    """
+    keys = {name: generation_cache_key(name) for name in names}
+    hits = cache.get_many(keys.values())
+    generations = {}
+    for name, key in keys.items():
+        if key not in hits:
+            if not create:
+                generations[name] = 0
+                continue
+            cache.add(key, time.time_ns(), None)
+            hits[key] = cache.get(key)
+        generations[name] = hits[key]
+    return generations
+
+
+def bump_generation(name):
+    """
+    Invalidate everything cached against a generation counter
+    """
+    key = generation_cache_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
 def cached_fn(key, timeout_seconds=60 * 5, cache_type="default"):
+    """
+    Memoise a function under a fixed key, or a key computed from its arguments.
+    """
+
     def decorator(original_fn):
+        @functools.wraps(original_fn)
         def resulting_fn(*args, **kwargs):
             cache_key = key(*args, **kwargs) if callable(key) else key
-
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-
-            try:
-                result = original_fn(*args, **kwargs)
-                cache.set(cache_key, result, timeout_seconds)
-                return result
-            except:
-                pass
+            return _get_or_compute(
+                original_fn.__qualname__,
+                caches[cache_type],
+                cache_key,
+                original_fn,
+                args,
+                kwargs,
+                {
+                    "ttl": timeout_seconds,
+                    "stale_ttl": 0,
+                    "negative_ttl": timeout_seconds,
+                    "jitter": 0,
+                    "lock_timeout": 30,
+                },
+            )
 
         return resulting_fn
 
-    return
+    return decorator
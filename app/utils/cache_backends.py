@@ -0,0 +1,336 @@
+from typing import Any, NamedTuple, Optional
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_missing = object()
+
+
+class SharedEntry(NamedTuple):
+    """
+    A value in the shared tier, with the wall clock time it expires at,
+    so that local copies never outlive it, and the stamp of the write.
+    """
+
+    expires_at: Optional[float]
+    stamp: str
+    value: Any
+
+
+class LocalEntry(NamedTuple):
+    expires_at: float
+    stamp: str
+    # When the stamp was last compared with the shared one
+    checked_at: float
+    pickled: bytes
+
+
+class TieredCache(BaseCache):
+    """
+    A bounded in-process LRU in front of a shared cache backend.
+
+    Reads are answered from the local tier when possible. Every write goes to
+    the shared tier, and also stores a new random stamp for the key in the
+    `STAMPS` backend (by default another instance of `SHARED`). A local copy
+    is served for up to `REVALIDATE_INTERVAL` seconds before its stamp is
+    compared with the shared one, in one `get_many` for all the keys being
+    read, and dropped if another process has written the key since.
+    A missing stamp counts as a change, so stamps can be culled safely.
+    Local entries also expire after `LOCAL_TIMEOUT` seconds, or when the shared
+    entry does if that's sooner.
+
+    Hit and miss counts are logged every `STATS_LOG_INTERVAL` seconds.
+
+    ```
+    CACHES = {
+        "default": {
+            "BACKEND": "app.utils.cache_backends.TieredCache",
+            "OPTIONS": {
+                "SHARED": {
+                    "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                    "LOCATION": "django_cache",
+                },
+                "STAMPS": {
+                    "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                    "LOCATION": "django_cache_stamps",
+                },
+            },
+        }
+    }
+    ```
+    """
+
+    stamp_prefix = "tiered_cache.stamp"
+    lock_prefix = "tiered_cache.lock"
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        shared = options["SHARED"]
+        stamps = options.get("STAMPS", shared)
+        self.shared = import_string(shared["BACKEND"])(
+            shared.get("LOCATION", ""), shared
+        )
+        self.stamps = import_string(stamps["BACKEND"])(
+            stamps.get("LOCATION", ""), stamps
+        )
+        self.local_max_entries = options.get("LOCAL_MAX_ENTRIES", 1000)
+        self.local_max_value_size = options.get("LOCAL_MAX_VALUE_SIZE", 5 * 1024**2)
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 60)
+        self.revalidate_interval = options.get("REVALIDATE_INTERVAL", 1)
+        self.lock_timeout = options.get("LOCK_TIMEOUT", 5)
+        self.stats_log_interval = options.get("STATS_LOG_INTERVAL", 60 * 5)
+
+        self._local = OrderedDict()
+        self._lock = threading.RLock()
+        self._counts = {
+            "local_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+        }
+        self._stats_logged_at = time.monotonic()
+
+    def _timeout(self, timeout):
+        # Shared backends expect a relative timeout, not `get_backend_timeout`'s expiry time
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _count(self, event, count=1):
+        with self._lock:
+            self._counts[event] += count
+
+    def _log_stats(self):
+        if self.stats_log_interval is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._stats_logged_at < self.stats_log_interval:
+                return
+            self._stats_logged_at = now
+        logger.info("Tiered cache stats for process %s: %s", os.getpid(), self.stats())
+
+    # Stamps
+
+    def _stamp_key(self, local_key):
+        return f"{self.stamp_prefix}.{hashlib.sha1(local_key.encode()).hexdigest()}"
+
+    def _new_stamp(self):
+        return uuid.uuid4().hex
+
+    # Shared tier
+
+    def _write(self, key, local_key, value, timeout, version):
+        stamp = self._new_stamp()
+        expires_at = None if timeout is None else time.time() + timeout
+        self.shared.set(
+            key, SharedEntry(expires_at, stamp, value), timeout, version=version
+        )
+        self.stamps.set(self._stamp_key(local_key), stamp, timeout)
+        self._local_set(local_key, stamp, value, timeout)
+
+    def _unwrap(self, entry):
+        """
+        A shared entry's value and the seconds it has left, None meaning forever
+        """
+        if not isinstance(entry, SharedEntry):
+            # Written before values were wrapped, so its expiry is unknown
+            return entry, None
+        if entry.expires_at is None:
+            return entry.value, None
+        return entry.value, entry.expires_at - time.time()
+
+    def _local_set_shared(self, local_key, entry):
+        value, remaining = self._unwrap(entry)
+        # Entries without a stamp can't be checked, so aren't kept locally
+        if isinstance(entry, SharedEntry) and (remaining is None or remaining > 0):
+            self._local_set(local_key, entry.stamp, value, remaining)
+        return value
+
+    # Local tier
+
+    def _local_get_many(self, local_keys):
+        """
+        The local copies of some keys, comparing the stamps of any that are
+        due to be checked in one read. Returns a dict of key to value.
+        """
+        now = time.monotonic()
+        found = {}
+        unchecked = {}
+        with self._lock:
+            for key in local_keys:
+                entry = self._local.get(key)
+                if entry is None:
+                    continue
+                if entry.expires_at < now:
+                    del self._local[key]
+                elif now - entry.checked_at < self.revalidate_interval:
+                    found[key] = entry
+                else:
+                    unchecked[key] = entry
+
+        if unchecked:
+            stamp_keys = {self._stamp_key(key): key for key in unchecked}
+            stamps = self.stamps.get_many(list(stamp_keys))
+            with self._lock:
+                for stamp_key, key in stamp_keys.items():
+                    entry = unchecked[key]
+                    current = self._local.get(key) is entry
+                    if stamps.get(stamp_key) == entry.stamp:
+                        found[key] = entry
+                        if current:
+                            self._local[key] = entry._replace(checked_at=now)
+                    else:
+                        self._count("invalidations")
+                        if current:
+                            del self._local[key]
+
+        with self._lock:
+            for key in found:
+                if key in self._local:
+                    self._local.move_to_end(key)
+        return {key: pickle.loads(entry.pickled) for key, entry in found.items()}
+
+    def _local_set(self, key, stamp, value, timeout):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(pickled) > self.local_max_value_size:
+            self._local_delete(key)
+            return
+        timeout = self.local_timeout if timeout is None else timeout
+        now = time.monotonic()
+        entry = LocalEntry(now + min(timeout, self.local_timeout), stamp, now, pickled)
+        with self._lock:
+            self._local[key] = entry
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self._log_stats()
+        local_keys = {
+            key: self.make_and_validate_key(key, version=version) for key in keys
+        }
+        local = self._local_get_many(local_keys.values())
+        found = {}
+        remaining = []
+        for key, local_key in local_keys.items():
+            if local_key in local:
+                found[key] = local[local_key]
+            else:
+                remaining.append(key)
+        self._count("local_hits", len(found))
+
+        if remaining:
+            shared = self.shared.get_many(remaining, version=version)
+            for key, entry in shared.items():
+                found[key] = self._local_set_shared(local_keys[key], entry)
+            self._count("shared_hits", len(shared))
+            self._count("misses", len(remaining) - len(shared))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self._write(key, local_key, value, self._timeout(timeout), version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        stamp = self._new_stamp()
+        expires_at = None if timeout is None else time.time() + timeout
+        if not self.shared.add(
+            key, SharedEntry(expires_at, stamp, value), timeout, version=version
+        ):
+            return False
+        # Other processes may still have a copy of the key from before it expired
+        self.stamps.set(self._stamp_key(local_key), stamp, timeout)
+        self._local_set(local_key, stamp, value, timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        entry = self.shared.get(key, _missing, version=version)
+        if entry is _missing:
+            return False
+        # Rewritten rather than touched, so the entry's own expiry stays right
+        value, _ = self._unwrap(entry)
+        self._write(key, local_key, value, self._timeout(timeout), version)
+        return True
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        deleted = self.shared.delete(key, version=version)
+        self.stamps.delete(self._stamp_key(local_key))
+        self._local_delete(local_key)
+        return deleted
+
+    @contextmanager
+    def _write_lock(self, local_key):
+        """
+        Serialise read-modify-writes of a key across processes, as the shared
+        tier's own `incr` may not be atomic (the database cache's isn't).
+        A lock left by a dead process expires after `LOCK_TIMEOUT` seconds.
+        """
+        lock_key = f"{self.lock_prefix}.{hashlib.sha1(local_key.encode()).hexdigest()}"
+        while not self.stamps.add(lock_key, True, self.lock_timeout):
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            self.stamps.delete(lock_key)
+
+    def incr(self, key, delta=1, version=None):
+        """
+        Like `BaseCache.incr`, but under a lock, and keeping the entry's expiry
+        """
+        local_key = self.make_and_validate_key(key, version=version)
+        with self._write_lock(local_key):
+            entry = self.shared.get(key, _missing, version=version)
+            if entry is _missing:
+                raise ValueError("Key '%s' not found" % key)
+            value, remaining = self._unwrap(entry)
+            if remaining is not None and remaining <= 0:
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            self._write(key, local_key, value, remaining, version)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version=version) is not _missing
+
+    def clear(self):
+        self.shared.clear()
+        # Every other process's local copies are dropped when it next checks them
+        self.stamps.clear()
+        with self._lock:
+            self._local.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+        self.stamps.close(**kwargs)
+
+    def stats(self):
+        """
+        Hit and miss counts for this process, since it started.
+        """
+        with self._lock:
+            return {**self._counts, "local_entries": len(self._local)}
@@ -0,0 +1,45 @@
+from collections import defaultdict
+
+from django.db.models import prefetch_related_objects
+from wagtail.images import get_image_model
+
+# What `app/cards/generic_list_card.html` reads from each page
+CARD_RELATIONS = ("related_impact_areas", "related_countries")
+CARD_RENDITIONS = ("fill-190x160",)
+
+
+def load_cards(pages, renditions=CARD_RENDITIONS, relations=CARD_RELATIONS):
+    """
+    Load what listing cards read from a list of specific pages, up front:
+    their related pages, their images and the renditions the cards use.
+
+    Takes one query per page type and relation, one for the images and one
+    for the renditions, however many cards there are. Returns the pages.
+    """
+    pages = list(pages)
+
+    pages_by_model = defaultdict(list)
+    for page in pages:
+        pages_by_model[type(page)].append(page)
+    for model, model_pages in pages_by_model.items():
+        model_relations = [name for name in relations if hasattr(model, name)]
+        if model_relations:
+            prefetch_related_objects(model_pages, *model_relations)
+
+    image_fields = ("featured_image", "first_image")
+    image_ids = {
+        getattr(page, f"{field}_id", None) for page in pages for field in image_fields
+    } - {None}
+    if not image_ids:
+        return pages
+
+    images = get_image_model().objects.all()
+    if renditions:
+        images = images.prefetch_renditions(*renditions)
+    images = images.in_bulk(image_ids)
+    for page in pages:
+        for field in image_fields:
+            image_id = getattr(page, f"{field}_id", None)
+            if image_id in images:
+                setattr(page, field, images[image_id])
+    return pages
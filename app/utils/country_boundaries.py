@@ -0,0 +1,88 @@
+import json
+
+from django.contrib.gis.geos import GEOSGeometry, MultiPolygon, Point, Polygon
+from django.db import transaction
+
+from app.models import CountryBoundary
+
+NATURAL_EARTH_VERSION = "v5.1.2"
+NATURAL_EARTH_URL = f"https://raw.githubusercontent.com/nvkelso/natural-earth-vector/{NATURAL_EARTH_VERSION}/geojson/ne_50m_admin_0_countries.geojson"
+
+
+def feature_isoa2(properties):
+    """
+    Natural Earth marks some countries (e.g. France, Norway) as -99 in ISO_A2,
+    because of overseas territories. ISO_A2_EH fills those gaps.
+    """
+    for field in ("ISO_A2_EH", "ISO_A2", "WB_A2"):
+        code = properties.get(field)
+        if code and len(code) == 2 and code != "-99":
+            return code.upper()
+    return None
+
+
+def as_multipolygon(geometry):
+    if isinstance(geometry, Polygon):
+        geometry = MultiPolygon(geometry, srid=geometry.srid)
+    if not isinstance(geometry, MultiPolygon):
+        return None
+    return geometry
+
+
+def boundary_from_feature(feature, dataset_version):
+    properties = feature.get("properties") or {}
+    isoa2 = feature_isoa2(properties)
+    if isoa2 is None or feature.get("geometry") is None:
+        return None
+
+    geometry = as_multipolygon(GEOSGeometry(json.dumps(feature["geometry"]), srid=4326))
+    if geometry is None:
+        return None
+
+    if properties.get("LABEL_X") is not None and properties.get("LABEL_Y") is not None:
+        # Natural Earth's label points avoid e.g. French Guiana dragging France's centroid
+        centroid = Point(properties["LABEL_X"], properties["LABEL_Y"], srid=4326)
+    else:
+        centroid = geometry.point_on_surface
+
+    boundary = CountryBoundary(
+        isoa2=isoa2,
+        isoa3=(properties.get("ISO_A3_EH") or properties.get("ISO_A3") or "")[:3],
+        name=properties.get("NAME_LONG") or properties.get("NAME") or isoa2,
+        geometry=geometry,
+        centroid=centroid,
+        dataset_version=dataset_version,
+    )
+    for field, tolerance in CountryBoundary.SIMPLIFIED_TOLERANCES.items():
+        setattr(
+            boundary,
+            field,
+            as_multipolygon(geometry.simplify(tolerance, preserve_topology=True)),
+        )
+    return boundary
+
+
+def load_country_boundaries(collection, dataset_version):
+    """
+    Replace the stored boundaries with a GeoJSON FeatureCollection of countries.
+    Returns the number of countries loaded.
+    """
+    boundaries = {}
+    for feature in collection["features"]:
+        boundary = boundary_from_feature(feature, dataset_version)
+        if boundary is not None:
+            boundaries.setdefault(boundary.isoa2, boundary)
+
+    with transaction.atomic():
+        CountryBoundary.objects.exclude(isoa2__in=boundaries.keys()).delete()
+        for boundary in boundaries.values():
+            CountryBoundary.objects.update_or_create(
+                isoa2=boundary.isoa2,
+                defaults={
+                    field.name: getattr(boundary, field.name)
+                    for field in CountryBoundary._meta.concrete_fields
+                    if field.name not in ("id", "isoa2", "updated_at")
+                },
+            )
+
+    return len(boundaries)
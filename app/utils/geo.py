@@ -1,5 +1,119 @@
-from geopy.exc import GeocoderUnavailable
+import hashlib
+import time
+from datetime import timedelta
+from math import floor
+
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from geopy.exc import GeocoderUnavailable, GeopyError
 from geopy.geocoders import Nominatim
 
+from app.utils.cache import django_cached
+
 geolocator = Nominatim(user_agent="info@hotosm.org")
 GeolocatorError = GeocoderUnavailable
+
+# Nominatim's usage policy allows one request per second, across all our processes
+NOMINATIM_REQUESTS_PER_SECOND = 1
+
+
+def wait_for_rate_limit(ns="nominatim", per_second=NOMINATIM_REQUESTS_PER_SECOND):
+    """
+    Block until this process may make a request, sharing the allowance
+    between processes through the cache.
+    """
+    while True:
+        now = time.time()
+        slot = int(now * per_second)
+        if cache.add(f"rate_limit.{ns}.{slot}", True, 10):
+            return
+        time.sleep((slot + 1) / per_second - now)
+
+
+# Cached names are refetched after this long
+GEOCODE_CACHE_REFRESH_AFTER = timedelta(days=180)
+
+
+def grid_cell_size(zoom):
+    """
+    Degrees per grid cell. Low zooms name regions, so points further apart can share a result.
+    """
+    return 0.1 if zoom <= 8 else 0.01
+
+
+def grid_cell(point, zoom):
+    size = grid_cell_size(zoom)
+    return floor(point.x / size), floor(point.y / size)
+
+
+def grid_cell_centre(cell_x, cell_y, zoom):
+    """
+    The (longitude, latitude) every point in a cell is geocoded as,
+    so a cell's cached name doesn't depend on which page filled it.
+    """
+    size = grid_cell_size(zoom)
+    return (cell_x + 0.5) * size, (cell_y + 0.5) * size
+
+
+def fetch_reverse_geocode(cell_x, cell_y, zoom):
+    from app.models import GeocodeCacheEntry
+
+    longitude, latitude = grid_cell_centre(cell_x, cell_y, zoom)
+    wait_for_rate_limit()
+    location = geolocator.reverse((latitude, longitude), zoom=zoom, exactly_one=True)
+    address = location.address if location is not None else None
+    GeocodeCacheEntry.objects.update_or_create(
+        zoom=zoom,
+        cell_x=cell_x,
+        cell_y=cell_y,
+        defaults={
+            "address": address,
+            "source": GeocodeCacheEntry.Source.NOMINATIM,
+            "fetched_at": timezone.now(),
+        },
+    )
+    return address
+
+
+def reverse_geocode(point, zoom=5):
+    """
+    The address of a point, or None if it isn't anywhere Nominatim knows.
+
+    Results are kept in the GeocodeCacheEntry table by grid cell, and only
+    fetched from Nominatim when missing or older than GEOCODE_CACHE_REFRESH_AFTER.
+    A stale name is still returned if Nominatim can't be reached.
+    """
+    from app.models import GeocodeCacheEntry
+
+    cell_x, cell_y = grid_cell(point, zoom)
+    entries = GeocodeCacheEntry.objects.filter(zoom=zoom, cell_x=cell_x, cell_y=cell_y)
+    entry = entries.first()
+    if entry is not None and (
+        entry.source == GeocodeCacheEntry.Source.PAGE
+        or entry.fetched_at > timezone.now() - GEOCODE_CACHE_REFRESH_AFTER
+    ):
+        entries.update(hits=F("hits") + 1, last_used_at=timezone.now())
+        return entry.address
+
+    try:
+        return fetch_reverse_geocode(cell_x, cell_y, zoom)
+    except GeopyError:
+        if entry is not None:
+            return entry.address
+        raise
+
+
+@django_cached(
+    "forward_geocode",
+    get_key=lambda query: hashlib.sha1(query.strip().lower().encode()).hexdigest(),
+    ttl=60 * 60 * 24 * 30,
+    negative_ttl=60 * 60 * 24,
+)
+def forward_geocode(query):
+    """
+    The (longitude, latitude) of a place name, or None if it can't be found.
+    """
+    wait_for_rate_limit()
+    location = geolocator.geocode(query, exactly_one=True)
+    return (location.longitude, location.latitude) if location is not None else None
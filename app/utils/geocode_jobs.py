@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.models import GeocodeJob
+from app.utils.geo import forward_geocode, reverse_geocode
+
+MAX_ATTEMPTS = 5
+
+# Jobs left running this long are assumed to belong to a worker that died
+RUNNING_TIMEOUT = timedelta(minutes=10)
+
+
+def claim_geocode_jobs(limit=10):
+    """
+    Mark a batch of due jobs as running. Rows locked by other workers are
+    skipped, so any number of workers can share the queue.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            GeocodeJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=GeocodeJob.Status.PENDING, run_after__lte=now)
+                | Q(
+                    status=GeocodeJob.Status.RUNNING,
+                    updated_at__lt=now - RUNNING_TIMEOUT,
+                )
+            )
+            .order_by("run_after")[:limit]
+        )
+        GeocodeJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=GeocodeJob.Status.RUNNING, updated_at=now
+        )
+    return jobs
+
+
+def update_latest_revision(page, matches, **values):
+    """
+    Copy geocoded values into the page's latest revision too, or publishing
+    that revision again would put back what it held before the lookup.
+    Only done while `matches` says the revision is still at the geocoded state.
+    """
+    revision = page.get_latest_revision()
+    if revision is None:
+        return
+    draft = revision.as_object()
+    if not matches(draft):
+        return
+    for name, value in values.items():
+        setattr(draft, name, value)
+    revision.content = draft.serializable_data()
+    revision.save(update_fields=["content"])
+
+
+def apply_reverse_geocode(job):
+    page = job.page.specific
+    address = reverse_geocode(job.coordinates)
+    if address is None:
+        return
+    # Only fill in the name if the page is still at the geocoded coordinates
+    type(page).objects.filter(
+        pk=page.pk,
+        coordinates__equals=job.coordinates,
+        geographical_location__isnull=True,
+    ).update(geographical_location=address[:250])
+    update_latest_revision(
+        page,
+        lambda draft: draft.coordinates is not None
+        and draft.coordinates.equals(job.coordinates)
+        and not draft.geographical_location,
+        geographical_location=address[:250],
+    )
+
+
+def apply_forward_geocode(job):
+    page = job.page.specific
+    coordinates = forward_geocode(job.query)
+    if coordinates is None:
+        return
+    updated = (
+        type(page)
+        .objects.filter(
+            pk=page.pk, coordinates__isnull=True, geographical_location=job.query
+        )
+        .update(coordinates=Point(*coordinates, srid=4326))
+    )
+    if updated:
+        type(page).update_map_points(pk=page.pk)
+    update_latest_revision(
+        page,
+        lambda draft: draft.coordinates is None
+        and draft.geographical_location == job.query,
+        coordinates=Point(*coordinates, srid=4326),
+    )
+
+
+def run_geocode_job(job):
+    try:
+        if job.kind == GeocodeJob.Kind.REVERSE:
+            apply_reverse_geocode(job)
+        else:
+            apply_forward_geocode(job)
+    except Exception as e:
+        job.attempts += 1
+        job.last_error = repr(e)
+        superseded = (
+            GeocodeJob.objects.filter(
+                page_id=job.page_id, kind=job.kind, status=GeocodeJob.Status.PENDING
+            )
+            .exclude(pk=job.pk)
+            .exists()
+        )
+        if job.attempts >= MAX_ATTEMPTS or superseded:
+            job.status = GeocodeJob.Status.FAILED
+        else:
+            job.status = GeocodeJob.Status.PENDING
+            # Back off exponentially: 2, 4, 8, 16 minutes
+            job.run_after = timezone.now() + timedelta(minutes=2**job.attempts)
+        job.save(
+            update_fields=[
+                "attempts",
+                "last_error",
+                "status",
+                "run_after",
+                "updated_at",
+            ]
+        )
+        return False
+
+    job.status = GeocodeJob.Status.DONE
+    job.save(update_fields=["status", "updated_at"])
+    return True
@@ -0,0 +1,224 @@
+import hashlib
+import uuid
+from math import floor
+
+from django.core.cache import cache
+from django.utils import timezone, translation
+from rest_framework.renderers import JSONRenderer
+from wagtail.models import Locale, Page
+
+from app.models import EventPage, OrganisationPage, PersonPage, ProjectPage
+from app.serializers import PageCoordinatesSerializer
+from app.utils.wagtail import localized_pages
+
+map_page_types = (
+    ProjectPage,
+    OrganisationPage,
+    PersonPage,
+    EventPage,
+)
+
+
+def map_feed_cache_key(language_code, part):
+    return f"map_feed.{language_code}.{part}"
+
+
+def get_map_pages(**filters):
+    return Page.objects.live().type(*map_page_types).filter(**filters)
+
+
+def serialize_features(pages):
+    """
+    Serialise pages into GeoJSON features, grouped by translation_key
+    so that a single group can be swapped out when a page is republished.
+    """
+    pages = list(pages)
+    features = PageCoordinatesSerializer(pages, many=True).data["features"]
+    index = {}
+    for page, feature in zip(pages, features):
+        index.setdefault(str(page.translation_key), []).append(feature)
+    return index
+
+
+def render_features(features):
+    return JSONRenderer().render({"type": "FeatureCollection", "features": features})
+
+
+def render_map_feed(language_code, index):
+    """
+    Render the feature index into the cached response: the GeoJSON body,
+    plus the ETag and Last-Modified values used for conditional requests.
+    """
+    body = render_features(
+        [feature for features in index.values() for feature in features]
+    )
+    response = {
+        "body": body,
+        "etag": '"%s"' % hashlib.sha1(body).hexdigest(),
+        "last_modified": timezone.now(),
+    }
+    cache.set(map_feed_cache_key(language_code, "index"), index, None)
+    cache.set(map_feed_cache_key(language_code, "response"), response, None)
+    cache.set(
+        map_feed_cache_key(language_code, "version"),
+        {"etag": response["etag"], "last_modified": response["last_modified"]},
+        None,
+    )
+    return response
+
+
+def build_map_feed(language_code):
+    with translation.override(language_code):
+        index = serialize_features(localized_pages(get_map_pages(), for_listing=True))
+        return render_map_feed(language_code, index)
+
+
+def get_map_feed(language_code=None):
+    """
+    Return the materialised map feed for a locale, building it on a cache miss.
+    """
+    language_code = language_code or translation.get_language()
+    hit = cache.get(map_feed_cache_key(language_code, "response"))
+    if hit is None:
+        hit = build_map_feed(language_code)
+    return hit
+
+
+def get_map_feed_version(language_code=None):
+    """
+    The ETag and Last-Modified of a locale's map feed, without loading the feed.
+    Before the feed has been built, a fresh version stands in for it.
+    """
+    language_code = language_code or translation.get_language()
+    key = map_feed_cache_key(language_code, "version")
+    version = cache.get(key)
+    if version is None:
+        cache.add(
+            key,
+            {"etag": '"%s"' % uuid.uuid4().hex, "last_modified": timezone.now()},
+            None,
+        )
+        version = cache.get(key)
+    return version
+
+
+def get_map_feed_index(language_code=None):
+    """
+    Return the per-translation_key features behind a locale's map feed.
+    """
+    language_code = language_code or translation.get_language()
+    hit = cache.get(map_feed_cache_key(language_code, "index"))
+    if hit is None:
+        build_map_feed(language_code)
+        hit = cache.get(map_feed_cache_key(language_code, "index"))
+    return hit
+
+
+def abbreviate_count(count):
+    if count >= 1000:
+        return f"{round(count / 1000, 1):g}k"
+    return str(count)
+
+
+def cluster_features(features, zoom, cells_per_tile=4):
+    """
+    Bucket point features into a grid sized to the zoom level and replace
+    crowded cells with a single cluster point, in the shape Mapbox GL uses
+    for its own clusters (`cluster`, `point_count`, `point_count_abbreviated`).
+    """
+    cell_size = 360 / (2**zoom) / cells_per_tile
+    cells = {}
+    for feature in features:
+        geometry = feature.get("geometry")
+        if geometry is None:
+            continue
+        longitude, latitude = geometry["coordinates"][:2]
+        cell = (floor(longitude / cell_size), floor(latitude / cell_size))
+        cells.setdefault(cell, []).append(feature)
+
+    clustered = []
+    for (x, y), members in cells.items():
+        if len(members) == 1:
+            clustered += members
+            continue
+        coordinates = [member["geometry"]["coordinates"] for member in members]
+        clustered.append(
+            {
+                "type": "Feature",
+                "id": f"cluster:{zoom}:{x}:{y}",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [
+                        sum(c[0] for c in coordinates) / len(coordinates),
+                        sum(c[1] for c in coordinates) / len(coordinates),
+                    ],
+                },
+                "properties": {
+                    "cluster": True,
+                    "point_count": len(members),
+                    "point_count_abbreviated": abbreviate_count(len(members)),
+                },
+            }
+        )
+    return clustered
+
+
+# How long an update may hold a locale's feed before others stop waiting on it
+MAP_FEED_LOCK_TIMEOUT = 60
+
+
+def update_map_feed(translation_key):
+    """
+    Re-serialise a single translation group in every cached locale feed.
+    Feeds that haven't been built yet are left to build on their next request.
+    """
+    for locale in Locale.objects.all():
+        language_code = locale.language_code
+        index = cache.get(map_feed_cache_key(language_code, "index"))
+        if index is None:
+            # Tiles are still versioned while the feed isn't built
+            cache.delete(map_feed_cache_key(language_code, "version"))
+            continue
+        lock_key = map_feed_cache_key(language_code, "lock")
+        stale_key = map_feed_cache_key(language_code, "stale")
+        if not cache.add(lock_key, True, MAP_FEED_LOCK_TIMEOUT):
+            # Another update is merging into the same feed and would write
+            # over this change, so the feed is thrown away and rebuilt instead.
+            # Whichever of us finishes last drops what the other wrote
+            cache.set(stale_key, True, MAP_FEED_LOCK_TIMEOUT)
+            invalidate_locale_map_feed(language_code)
+            continue
+        try:
+            # Re-read it now that nobody else is changing it
+            index = cache.get(map_feed_cache_key(language_code, "index"))
+            if index is None:
+                continue
+            with translation.override(language_code):
+                features = serialize_features(
+                    localized_pages(
+                        get_map_pages(translation_key=translation_key),
+                        for_listing=True,
+                    )
+                )
+                index.pop(str(translation_key), None)
+                index.update(features)
+                render_map_feed(language_code, index)
+        finally:
+            cache.delete(lock_key)
+            if cache.delete(stale_key):
+                invalidate_locale_map_feed(language_code)
+
+
+def invalidate_locale_map_feed(language_code):
+    cache.delete_many(
+        [
+            map_feed_cache_key(language_code, "index"),
+            map_feed_cache_key(language_code, "response"),
+            map_feed_cache_key(language_code, "version"),
+        ]
+    )
+
+
+def invalidate_map_feed():
+    for locale in Locale.objects.all():
+        invalidate_locale_map_feed(locale.language_code)
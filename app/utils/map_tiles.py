@@ -0,0 +1,136 @@
+import hashlib
+import json
+from math import atan, degrees, pi, sinh
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import translation
+
+from app.utils.map_feed import get_map_feed_index, get_map_feed_version
+
+# Mapbox's default vector tile resolution, and the buffer kept around each
+# tile so that markers straddling a tile edge aren't clipped
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+# Web mercator can't represent the poles
+MAX_LATITUDE = 85.0511
+
+TILE_SQL = """
+WITH points AS (
+    SELECT
+        ST_AsMVTGeom(
+            ST_Transform(
+                ST_SetSRID(ST_GeomFromGeoJSON(feature -> 'geometry'), 4326), 3857
+            ),
+            ST_TileEnvelope(%(z)s, %(x)s, %(y)s),
+            %(extent)s,
+            %(buffer)s,
+            true
+        ) AS geom,
+        (feature ->> 'id')::integer AS id,
+        feature -> 'properties' ->> 'label' AS label,
+        feature -> 'properties' ->> 'title' AS title,
+        feature -> 'properties' ->> 'url' AS url,
+        feature -> 'properties' ->> 'map_image_url' AS map_image_url,
+        feature -> 'properties' ->> 'geographical_location' AS geographical_location,
+        (feature -> 'properties' ->> 'has_unique_location')::boolean
+            AS has_unique_location
+    FROM jsonb_array_elements(%(features)s::jsonb) AS feature
+)
+SELECT ST_AsMVT(points, 'pages', %(extent)s, 'geom', 'id')
+FROM points
+WHERE geom IS NOT NULL
+"""
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= 22 and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def tile_bounds(z, x, y):
+    """
+    The (west, south, east, north) bounds of a slippy map tile, in degrees.
+    """
+    n = 2**z
+    west = x / n * 360 - 180
+    east = (x + 1) / n * 360 - 180
+    north = degrees(atan(sinh(pi * (1 - 2 * y / n))))
+    south = degrees(atan(sinh(pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def buffered_tile_bounds(z, x, y):
+    """
+    A tile's bounds plus its buffer, clamped to what web mercator can show.
+    """
+    west, south, east, north = tile_bounds(z, x, y)
+    margin_x = (east - west) * TILE_BUFFER / TILE_EXTENT
+    margin_y = (north - south) * TILE_BUFFER / TILE_EXTENT
+    return (
+        west - margin_x,
+        max(south - margin_y, -MAX_LATITUDE),
+        east + margin_x,
+        min(north + margin_y, MAX_LATITUDE),
+    )
+
+
+def features_in_tile(z, x, y, language_code=None):
+    """
+    The features of a locale's materialised map feed that are near a tile,
+    so tiles are cut from the feed instead of querying and serialising pages.
+    """
+    west, south, east, north = buffered_tile_bounds(z, x, y)
+    features = []
+    for group in get_map_feed_index(language_code).values():
+        for feature in group:
+            geometry = feature.get("geometry")
+            if geometry is None:
+                continue
+            longitude, latitude = geometry["coordinates"][:2]
+            if west <= longitude <= east and south <= latitude <= north:
+                features.append(feature)
+    return features
+
+
+def render_map_tile(z, x, y, features):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TILE_SQL,
+            {
+                "z": z,
+                "x": x,
+                "y": y,
+                "extent": TILE_EXTENT,
+                "buffer": TILE_BUFFER,
+                "features": json.dumps(list(features)),
+            },
+        )
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else b""
+
+
+def map_tile_version(feed_version, z, x, y):
+    return hashlib.sha1(f"{feed_version['etag']}/{z}/{x}/{y}".encode()).hexdigest()
+
+
+def get_map_tile(z, x, y, language_code=None):
+    """
+    Return a Mapbox vector tile of the map feed. Each tile is cached under one
+    key along with the feed version it was cut from, so publishing a geocoded
+    page (which updates the feed) invalidates every tile at once, and the new
+    tile replaces the old one instead of being stored alongside it.
+    """
+    language_code = language_code or translation.get_language()
+    feed_version = get_map_feed_version(language_code)
+    version = map_tile_version(feed_version, z, x, y)
+    key = f"map_tile.{language_code}.{z}.{x}.{y}"
+
+    cached = cache.get(key)
+    if cached is not None and cached["version"] == version:
+        tile = cached["tile"]
+    else:
+        tile = render_map_tile(z, x, y, features_in_tile(z, x, y, language_code))
+        cache.set(key, {"version": version, "tile": tile}, 60 * 60 * 24)
+
+    return tile, {**feed_version, "etag": f'"{version}"'}
@@ -0,0 +1,120 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+
+from app.utils.cache import bump_generation, get_generations
+
+# Tracking parameters that don't change what a page renders
+IGNORED_QUERY_PARAMS = ("fbclid", "gclid", "mc_cid", "mc_eid")
+IGNORED_QUERY_PREFIXES = ("utm_",)
+
+
+# Bumped on every publish and unpublish: listings, carousels and the map on
+# any page may show the page that changed
+PAGE_CACHE_GENERATION = "page_cache"
+
+
+def page_cache_generation(path):
+    return f"page_cache.{path}"
+
+
+def page_cache_query(query_dict):
+    """
+    The query string a cached page is keyed by: sorted, minus tracking parameters.
+    """
+    return urlencode(
+        sorted(
+            (key, value)
+            for key, values in query_dict.lists()
+            if key not in IGNORED_QUERY_PARAMS
+            and not key.startswith(IGNORED_QUERY_PREFIXES)
+            for value in values
+        )
+    )
+
+
+def page_cache_key(request):
+    path = request.path
+    # Bumping a path's counter starts it from the clock, so it never returns to 0.
+    # If it's culled, pages cached before its first bump could be served again,
+    # but only until PAGE_CACHE_TIMEOUT
+    generations = get_generations(
+        [page_cache_generation(path), PAGE_CACHE_GENERATION], create=False
+    )
+    key = "|".join(
+        [
+            path,
+            translation.get_language() or "",
+            page_cache_query(request.GET),
+            str(generations[page_cache_generation(path)]),
+            str(generations[PAGE_CACHE_GENERATION]),
+        ]
+    )
+    return f"page_cache.{hashlib.sha1(key.encode()).hexdigest()}"
+
+
+def is_cacheable_request(request):
+    return (
+        getattr(settings, "PAGE_CACHE_ENABLED", False)
+        and request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+    )
+
+
+def is_cacheable_response(request, response):
+    resolver_match = getattr(request, "resolver_match", None)
+    return (
+        resolver_match is not None
+        and resolver_match.url_name == "wagtail_serve"
+        and response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # Pages with forms hand out a CSRF token, which mustn't be shared
+        and not request.META.get("CSRF_COOKIE_USED")
+        and "private" not in response.get("Cache-Control", "")
+        and not getattr(request, "is_preview", False)
+    )
+
+
+def get_cached_page(request):
+    return cache.get(page_cache_key(request))
+
+
+def set_cached_page(request, response):
+    cache.set(
+        page_cache_key(request),
+        {"content": response.content, "headers": dict(response.items())},
+        getattr(settings, "PAGE_CACHE_TIMEOUT", 60 * 10),
+    )
+
+
+def page_url_paths(page):
+    """
+    The paths a page is served on, in every locale it's translated into.
+    """
+    paths = set()
+    for translation_page in page.get_translations(inclusive=True):
+        url_parts = translation_page.get_url_parts()
+        if url_parts is not None:
+            paths.add(url_parts[2])
+    return paths
+
+
+def purge_page_cache():
+    """
+    Expire every cached response, as any page may list the one that changed.
+    """
+    bump_generation(PAGE_CACHE_GENERATION)
+
+
+def purge_pages_cache(pages):
+    """
+    Expire the cached responses of just these pages, for changes that
+    don't go through a publish, like moves and slug changes.
+    """
+    for page in pages:
+        for path in page_url_paths(page):
+            bump_generation(page_cache_generation(path))
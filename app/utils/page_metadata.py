@@ -0,0 +1,144 @@
+import uuid
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection
+from django.db.models import OuterRef, Q, Subquery
+from wagtail.models import Page, PageViewRestriction
+
+from app.models import PageMetadataIndex
+
+
+def page_years(page):
+    return sorted(
+        {
+            published_at.year
+            for published_at in (page.first_published_at, page.last_published_at)
+            if published_at is not None
+        }
+    )
+
+
+def index_page_metadata(page):
+    """
+    Refresh the metadata index entry of a page.
+    """
+    page = page.specific
+    country_codes = []
+    if hasattr(page, "related_countries"):
+        country_codes = sorted(
+            {
+                code.upper()
+                for code in page.related_countries.values_list("isoa2", flat=True)
+                if code
+            }
+        )
+    impact_area_keys = []
+    if hasattr(page, "related_impact_areas"):
+        impact_area_keys = sorted(
+            set(page.related_impact_areas.values_list("translation_key", flat=True))
+        )
+
+    PageMetadataIndex.objects.update_or_create(
+        page_id=page.pk,
+        defaults={
+            "content_type_id": page.content_type_id,
+            "locale_id": page.locale_id,
+            "translation_key": page.translation_key,
+            "path": page.path,
+            "live": page.live,
+            "public": not page.get_view_restrictions().exists(),
+            "years": page_years(page),
+            "country_codes": country_codes,
+            "impact_area_keys": impact_area_keys,
+            "title": page.title,
+            "sort_date": page.first_published_at or page.last_published_at,
+        },
+    )
+
+
+def unindex_page_metadata(page):
+    PageMetadataIndex.objects.filter(page_id=page.pk).update(live=False)
+
+
+def refresh_metadata_paths(page):
+    """
+    Copy the tree paths of a moved page and its descendants into the index.
+    """
+    PageMetadataIndex.objects.filter(page__path__startswith=page.path).update(
+        path=Subquery(Page.objects.filter(pk=OuterRef("page_id")).values("path")[:1])
+    )
+
+
+def refresh_public_flags(page):
+    """
+    Recompute whether a page and its descendants are public,
+    after a view restriction on one of them has changed.
+    """
+    restricted = Q()
+    for path in PageViewRestriction.objects.values_list("page__path", flat=True):
+        restricted |= Q(path__startswith=path)
+
+    subtree = PageMetadataIndex.objects.filter(path__startswith=page.path)
+    subtree.update(public=True)
+    if restricted:
+        subtree.filter(restricted).update(public=False)
+
+
+def valid_uuids(values):
+    keys = []
+    for value in values:
+        try:
+            keys.append(uuid.UUID(str(value)))
+        except ValueError:
+            continue
+    return keys
+
+
+def facet_counts(facets):
+    """
+    Count the distinct translations in Page querysets, grouped by a field of
+    their metadata index entries, in one statement.
+
+    `facets` maps names to a (queryset, field name) pair. Array fields are
+    counted per element, and a field name of None counts the whole queryset.
+    Returns a dict of names to either {value as text: count} or a count.
+    """
+    quote = connection.ops.quote_name
+    table = quote(PageMetadataIndex._meta.db_table)
+    translation_key = f"{table}.{quote('translation_key')}"
+
+    selects = []
+    params = []
+    for name, (pages, field_name) in facets.items():
+        ids_sql, ids_params = pages.order_by().values("pk").query.sql_with_params()
+        source = table
+        if field_name is None:
+            value, group_by = "NULL", ""
+        else:
+            field = PageMetadataIndex._meta.get_field(field_name)
+            column = f"{table}.{quote(field.column)}"
+            if isinstance(field, ArrayField):
+                source = f"{table} CROSS JOIN unnest({column}) AS facet_value"
+                value, group_by = "facet_value::text", "GROUP BY facet_value"
+            else:
+                value, group_by = f"{column}::text", f"GROUP BY {column}"
+        selects.append(
+            f"SELECT %s, {value}, COUNT(DISTINCT {translation_key}) FROM {source} "
+            f"WHERE {table}.{quote('page_id')} IN ({ids_sql}) {group_by}"
+        )
+        params += [name, *ids_params]
+
+    counts = {
+        name: 0 if field_name is None else {}
+        for name, (pages, field_name) in facets.items()
+    }
+    if not selects:
+        return counts
+    with connection.cursor() as cursor:
+        cursor.execute(" UNION ALL ".join(selects), params)
+        for name, value, count in cursor.fetchall():
+            if isinstance(counts[name], dict):
+                counts[name][value] = count
+            else:
+                counts[name] = count
+    return counts
@@ -0,0 +1,53 @@
+import threading
+from contextlib import contextmanager
+
+from django.utils import translation
+
+from app.utils.cache import django_cached_key
+
+_local = threading.local()
+
+
+def get_request_cache():
+    """
+    The memo dict for the request being served on this thread, or None
+    outside of a request (management commands, signals fired from the shell).
+    """
+    return getattr(_local, "cache", None)
+
+
+@contextmanager
+def request_cache():
+    _local.cache = {}
+    try:
+        yield _local.cache
+    finally:
+        del _local.cache
+
+
+def request_memo(ns, get_key=None):
+    """
+    Like `django_cached`, but results only live as long as the current request.
+
+    Use it for values that templates read several times per render, where a
+    shared cache would need invalidating. Keys are scoped to the active
+    language. Outside of a request the function is simply called.
+    """
+
+    def decorator(fn):
+        def memoized_fn(*args, **kwargs):
+            memo = get_request_cache()
+            if memo is None:
+                return fn(*args, **kwargs)
+
+            key = (
+                django_cached_key(ns, get_key, *args, **kwargs),
+                translation.get_language(),
+            )
+            if key not in memo:
+                memo[key] = fn(*args, **kwargs)
+            return memo[key]
+
+        return memoized_fn
+
+    return decorator
@@ -0,0 +1,92 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from html import unescape
+
+from django.conf import settings
+from django.utils.html import strip_tags
+from django.utils.text import slugify
+
+# Draftail doesn't nest headings, so a heading runs to the next closing tag of its level
+HEADING_RE = re.compile(r"<(h[1-6])(\s[^>]*)?>(.*?)</\1\s*>", re.I | re.S)
+ID_ATTRIBUTE_RE = re.compile(r"""\sid\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""", re.I)
+
+
+def heading_text(inner_html):
+    return unescape(strip_tags(inner_html))
+
+
+def heading_id(inner_html):
+    return slugify(heading_text(inner_html))
+
+
+def iter_headings(html):
+    """
+    The (level, text, fragment id) of each heading in some HTML.
+    """
+    for match in HEADING_RE.finditer(html):
+        yield int(match.group(1)[1]), heading_text(match.group(3)), heading_id(
+            match.group(3)
+        )
+
+
+def add_heading_ids(html):
+    """
+    Give every heading a fragment id made from its text, in one pass over
+    the HTML and leaving everything outside the opening tags untouched.
+    """
+
+    def replace(match):
+        tag, attributes, inner_html = match.groups()
+        attributes = ID_ATTRIBUTE_RE.sub("", attributes or "")
+        return f'<{tag}{attributes} id="{heading_id(inner_html)}">{inner_html}</{tag}>'
+
+    return HEADING_RE.sub(replace, html)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_heading_ids(html):
+    """
+    `add_heading_ids`, memoised by a hash of the HTML in a bounded LRU,
+    since the same rich text is rendered on every request for its page.
+    """
+    key = hashlib.sha1(html.encode()).digest()
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            return result
+
+    result = add_heading_ids(html)
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > getattr(settings, "RICHTEXT_HEADING_CACHE_SIZE", 1000):
+            _cache.popitem(last=False)
+    return result
+
+
+def clear_heading_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def nest_headings(outline, levels=(2, 3, 4)):
+    """
+    Turn a flat heading outline into a tree for a table of contents,
+    where each heading's `children` are the deeper headings that follow it.
+    """
+    tree = []
+    stack = []
+    for heading in outline:
+        if heading["level"] not in levels or not heading["id"]:
+            continue
+        node = {**heading, "children": []}
+        while stack and stack[-1]["level"] >= node["level"]:
+            stack.pop()
+        (stack[-1]["children"] if stack else tree).append(node)
+        stack.append(node)
+    return tree
@@ -0,0 +1,197 @@
+import re
+
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import translation
+from django.utils.html import format_html
+from taggit.managers import TaggableManager
+
+from app.helpers import concat_html
+from app.models import PageSearchIndex
+from app.utils.streamfield import html_to_text, page_body_text
+
+# Postgres text search configurations for the languages that have one,
+# everything else is indexed without stemming
+SEARCH_CONFIGS = {
+    "da": "danish",
+    "de": "german",
+    "en": "english",
+    "es": "spanish",
+    "fi": "finnish",
+    "fr": "french",
+    "hu": "hungarian",
+    "it": "italian",
+    "nl": "dutch",
+    "no": "norwegian",
+    "pt": "portuguese",
+    "ro": "romanian",
+    "ru": "russian",
+    "sv": "swedish",
+    "tr": "turkish",
+}
+
+
+def search_config(language_code):
+    if not language_code:
+        return "simple"
+    return SEARCH_CONFIGS.get(language_code.split("-")[0].lower(), "simple")
+
+
+def page_taxonomy_text(page):
+    names = []
+    for field in page._meta.get_fields():
+        if isinstance(field, TaggableManager):
+            names += [tag.name for tag in getattr(page, field.name).all()]
+    for relation in ("related_countries", "related_impact_areas"):
+        if hasattr(page, relation):
+            names += [related.title for related in getattr(page, relation).all()]
+    return "\n".join(names)
+
+
+def search_vector():
+    config = F("config")
+    return (
+        SearchVector("title", weight="A", config=config)
+        + SearchVector("summary", weight="B", config=config)
+        + SearchVector("taxonomy", weight="B", config=config)
+        + SearchVector("body", weight="C", config=config)
+    )
+
+
+def index_page(page):
+    """
+    Refresh the search index entry of a live page.
+    """
+    page = page.specific
+    PageSearchIndex.objects.update_or_create(
+        page_id=page.pk,
+        defaults={
+            "config": search_config(page.locale.language_code),
+            "title": page.title,
+            "summary": html_to_text(getattr(page, "short_summary", None) or ""),
+            "taxonomy": page_taxonomy_text(page),
+            "body": page.plain_text
+            if getattr(page, "plain_text", None) is not None
+            else page_body_text(page),
+        },
+    )
+    PageSearchIndex.objects.filter(page_id=page.pk).update(
+        search_vector=search_vector()
+    )
+
+
+def unindex_page(page):
+    PageSearchIndex.objects.filter(page_id=page.pk).delete()
+
+
+def get_search_query(query, language_code=None, config_field=None):
+    """
+    A web search style query, stemmed for `language_code` if one is given, or
+    else for the text search configuration stored in `config_field`, so every
+    page is matched in its own language.
+    """
+    if language_code is None and config_field is not None:
+        config = F(config_field)
+    else:
+        config = search_config(language_code or translation.get_language())
+    return SearchQuery(query, search_type="websearch", config=config)
+
+
+def match_pages(pages, query, language_code=None):
+    """
+    Filter a Page queryset to those matching a search query, without ranking them.
+    """
+    return pages.filter(
+        search_index__search_vector=get_search_query(
+            query, language_code, "search_index__config"
+        )
+    )
+
+
+def search_pages(pages, query, language_code=None):
+    """
+    Filter a Page queryset to those matching a search query, best matches first.
+    The query accepts web search syntax: "quoted phrases", or, -exclusions.
+    """
+    search_query = get_search_query(query, language_code, "search_index__config")
+    return (
+        match_pages(pages, query, language_code)
+        .annotate(
+            search_rank=SearchRank(F("search_index__search_vector"), search_query)
+        )
+        .order_by("-search_rank", "-first_published_at", "pk")
+    )
+
+
+HIGHLIGHT_START = "<cksearch:hl>"
+HIGHLIGHT_STOP = "</cksearch:hl>"
+
+
+def format_highlight(headline):
+    """
+    Escape a headline from Postgres, wrapping the matched words in spans.
+    """
+    groups = [part.split(HIGHLIGHT_STOP) for part in headline.split(HIGHLIGHT_START)]
+    start = groups.pop(0)[0]
+    highlights = tuple(
+        format_html(
+            '<span class="search-highlight">{}</span>{}', highlight, "".join(rest)
+        )
+        for highlight, *rest in groups
+    )
+    return concat_html(start, *highlights)
+
+
+def search_highlights(pages, query, language_code=None):
+    """
+    Highlighted excerpts of the indexed text of a page of results, in one query.
+    Returns a dict of page id to HTML.
+    """
+    headlines = (
+        PageSearchIndex.objects.filter(page_id__in=[page.pk for page in pages])
+        .annotate(
+            headline=SearchHeadline(
+                Coalesce(NullIf("body", Value("")), "summary"),
+                get_search_query(query, language_code, "config"),
+                config=F("config")
+                if language_code is None
+                else search_config(language_code),
+                min_words=60,
+                max_words=80,
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP,
+            )
+        )
+        .values_list("page_id", "headline")
+    )
+    return {page_id: format_highlight(headline) for page_id, headline in headlines}
+
+
+def search_terms(query):
+    """
+    The words a web search style query is looking for, minus operators and exclusions.
+    """
+    return [
+        term.lower()
+        for term in re.findall(r"-?[\w']+", query)
+        if not term.startswith("-") and term.lower() != "or"
+    ]
+
+
+def search_section(outline, query):
+    """
+    The fragment id of the first heading in a page's outline that mentions
+    one of the search terms, so results can link straight to that section.
+    """
+    terms = search_terms(query)
+    for heading in outline or ():
+        text = heading["text"].lower()
+        if heading["id"] and any(term in text for term in terms):
+            return heading["id"]
+    return None
@@ -0,0 +1,124 @@
+import re
+from html import unescape
+
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+from wagtail import blocks
+from wagtail.fields import RichTextField, StreamField
+
+from app.utils.richtext import iter_headings
+
+BLOCK_END_RE = re.compile(r"(</(?:p|h[1-6]|li|blockquote|div)>|<br\s*/?>)", re.I)
+
+
+def separate_blocks(html):
+    # So that e.g. a heading and the paragraph after it don't run together
+    return BLOCK_END_RE.sub(r"\1\n", html)
+
+
+def html_to_text(html):
+    return unescape(strip_tags(separate_blocks(html))).strip()
+
+
+def block_text(block, value):
+    """
+    The human-readable text in a block's value, e.g. for search indexing.
+    Links, choices, images and page references are left out.
+    """
+    if value is None:
+        return []
+    if isinstance(block, blocks.RichTextBlock):
+        return [html_to_text(value.source)]
+    if isinstance(block, blocks.RawHTMLBlock):
+        return [html_to_text(value)]
+    if isinstance(block, (blocks.CharBlock, blocks.TextBlock)):
+        return [value] if value else []
+    if isinstance(block, blocks.StructBlock):
+        return [
+            text
+            for name, child_block in block.child_blocks.items()
+            for text in block_text(child_block, value.get(name))
+        ]
+    if isinstance(block, blocks.ListBlock):
+        return [text for item in value for text in block_text(block.child_block, item)]
+    if isinstance(block, blocks.StreamBlock):
+        return [
+            text for child in value for text in block_text(child.block, child.value)
+        ]
+    return []
+
+
+def streamfield_text(stream_value):
+    if stream_value is None:
+        return ""
+    return "\n".join(
+        text
+        for child in stream_value
+        for text in block_text(child.block, child.value)
+        if text
+    )
+
+
+def stream_blocks(stream_value, block_type):
+    """
+    The values of the top-level blocks of one type, in order.
+    """
+    if stream_value is None:
+        return []
+    return [child.value for child in stream_value if child.block_type == block_type]
+
+
+def richtext_html(stream_value):
+    """
+    The source HTML of every rich text block in a stream, however deeply nested.
+    """
+
+    def walk(block, value):
+        if value is None:
+            return
+        if isinstance(block, blocks.RichTextBlock):
+            yield value.source
+        elif isinstance(block, blocks.StructBlock):
+            for name, child_block in block.child_blocks.items():
+                yield from walk(child_block, value.get(name))
+        elif isinstance(block, blocks.ListBlock):
+            for item in value:
+                yield from walk(block.child_block, item)
+        elif isinstance(block, blocks.StreamBlock):
+            for child in value:
+                yield from walk(child.block, child.value)
+
+    if stream_value is None:
+        return []
+    return [html for child in stream_value for html in walk(child.block, child.value)]
+
+
+def heading_outline(html_fragments):
+    """
+    The headings in some rich text, with the fragment ids they're rendered with.
+    """
+    return [
+        {"level": level, "text": text.strip(), "id": fragment_id}
+        for html in html_fragments
+        for level, text, fragment_id in iter_headings(html)
+        if text.strip()
+    ]
+
+
+def summary_text(html, words=50):
+    return Truncator(strip_tags(separate_blocks(html))).words(words)
+
+
+def page_body_text(page, exclude=("short_summary",)):
+    """
+    All the StreamField and rich text content of a specific page, as plain text.
+    """
+    texts = []
+    for field in page._meta.concrete_fields:
+        if field.name in exclude:
+            continue
+        if isinstance(field, StreamField):
+            texts.append(streamfield_text(getattr(page, field.name)))
+        elif isinstance(field, RichTextField):
+            texts.append(html_to_text(getattr(page, field.name) or ""))
+    return "\n".join(text for text in texts if text)
@@ -1,23 +1,268 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import defaultdict
+
 from django.apps import apps
-from django.db.models import Q, Subquery
-from wagtail.models import Page
+from django.contrib.contenttypes.models import ContentType
+from django.core.paginator import Paginator
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.utils.functional import cached_property
+from wagtail.models import Locale, Page
 
-from app.utils.python import ensure_1D_list
+from app.utils.request_cache import request_memo
 
 
+@request_memo(
+    "localized_related_pages",
+    lambda page, property: f"{page.translation_key}.{property}",
+)
 def localized_related_pages(page, property: str):
     """
     Collect foreign key references for each translation of a page.
+
+    The relations of every translation are fetched in one query by joining
+    the M2M table on `translation_key`, then localised in bulk.
+    """
+    field = type(page)._meta.get_field(property)
+    through = field.remote_field.through
+    related_ids = through.objects.filter(
+        **{f"{field.m2m_field_name()}__translation_key": page.translation_key}
+    ).values(field.m2m_reverse_field_name())
+    related_pages = field.related_model.objects.filter(pk__in=Subquery(related_ids))
+    return localize_pages(related_pages)
+
+
+def localized_pages(pages, **kwargs):
+    return localize_pages(pages, **kwargs)
+
+
+def localize_pages(pages, locale=None, for_listing=False):
+    """
+    Bulk equivalent of `[page.specific.localized for page in pages]`.
+
+    Translations in the active locale are resolved with one query on
+    `translation_key`, and specific instances are then loaded with one query
+    per content type. Duplicates are removed, otherwise order is kept.
+    Pass `for_listing` to leave out the columns listings don't read.
+    """
+    pages = list(pages)
+    if len(pages) == 0:
+        return []
+
+    if locale is None:
+        try:
+            locale = Locale.get_active()
+        except (LookupError, Locale.DoesNotExist):
+            locale = None
+
+    translations = {}
+    if locale is not None:
+        translation_keys = {
+            p.translation_key for p in pages if p.locale_id != locale.id
+        }
+        if len(translation_keys):
+            # Like `Page.localized`, drafts don't count as translations
+            translations = {
+                p.translation_key: p
+                for p in Page.objects.live().filter(
+                    translation_key__in=translation_keys, locale=locale
+                )
+            }
+
+    localized = {}
+    for page in pages:
+        if locale is not None and page.locale_id != locale.id:
+            page = translations.get(page.translation_key, page)
+        localized.setdefault(page.pk, page)
+
+    return specific_pages(localized.values(), for_listing=for_listing)
+
+
+@request_memo(
+    "page_ancestors",
+    lambda page, inclusive=False: f"{page.path}.{inclusive}",
+)
+def page_ancestors(page, inclusive=False):
+    """
+    A page's ancestors, root first, fetched once per request however many
+    breadcrumbs, menus and theme lookups ask for them.
+    """
+    return list(page.get_ancestors(inclusive=inclusive).select_related("content_type"))
+
+
+def is_ancestor(page, current_page):
+    """
+    Whether `page` is `current_page` or one of its ancestors, from their tree paths.
+    """
+    return current_page.path.startswith(page.path)
+
+
+def distinct_translations(pages, locale=None):
+    """
+    Narrow a Page queryset to one row per translation_key, in SQL.
+
+    The row in the active locale is kept where the queryset has one,
+    otherwise the oldest translation is. Use `localize_pages` on the
+    rows you display to swap in active locale translations outside the queryset.
+    """
+    if locale is None:
+        try:
+            locale = Locale.get_active()
+        except (LookupError, Locale.DoesNotExist):
+            locale = None
+
+    same_group = pages.filter(translation_key=OuterRef("translation_key"))
+    earlier = same_group.filter(pk__lt=OuterRef("pk"))
+    if locale is None:
+        return pages.filter(~Exists(earlier))
+
+    return pages.filter(
+        Q(locale=locale)
+        | (
+            ~Exists(same_group.filter(locale=locale))
+            & ~Exists(earlier.exclude(locale=locale))
+        )
+    )
+
+
+class CountingPaginator(Paginator):
+    """
+    A Paginator that counts a queryset without its annotations and ordering,
+    which Postgres would otherwise compute for every row just to count them.
+    Pass `count` when it is already known, to skip the query altogether.
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.__dict__["count"] = count
+
+    @cached_property
+    def count(self):
+        return self.object_list.order_by().values("pk").count()
+
+
+class KeysetPage:
+    """
+    One page of a `KeysetPaginator`, with the cursor it starts after
+    and the one to fetch the next page with.
+    """
+
+    def __init__(self, object_list, cursor, next_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Pages through a queryset by `field` descending and then pk descending,
+    fetching each page from where the previous one ended rather than with an
+    OFFSET, so that every page costs the same however deep it is.
+
+    Pages are addressed by opaque cursors. Nulls come first, as in a Postgres
+    descending index. `to_python` turns a cursor's JSON value back into a
+    field value, returning None if it's invalid.
+    """
+
+    def __init__(self, object_list, per_page, field, to_python=lambda value: value):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.field = field
+        self.to_python = to_python
+
+    def encode_cursor(self, value, pk):
+        if hasattr(value, "isoformat"):
+            # In full, as rows a microsecond apart would otherwise be skipped
+            value = value.isoformat()
+        data = json.dumps([value, pk]).encode()
+        return urlsafe_b64encode(data).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        """
+        The (value, pk) a cursor points at, or None if it's missing or malformed
+        """
+        if not cursor:
+            return None
+        try:
+            value, pk = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if value is not None:
+                value = self.to_python(value)
+                if value is None:
+                    return None
+        except (ValueError, TypeError):
+            return None
+        if not isinstance(pk, int):
+            return None
+        return value, pk
+
+    def after(self, value, pk):
+        if value is None:
+            return Q(**{f"{self.field}__isnull": False}) | Q(
+                **{f"{self.field}__isnull": True, "pk__lt": pk}
+            )
+        return Q(**{f"{self.field}__lt": value}) | Q(
+            **{self.field: value, "pk__lt": pk}
+        )
+
+    def page(self, cursor=None):
+        position = self.decode_cursor(cursor)
+        queryset = self.object_list.annotate(keyset_value=F(self.field)).order_by(
+            F(self.field).desc(nulls_first=True), "-pk"
+        )
+        if position is not None:
+            queryset = queryset.filter(self.after(*position))
+
+        # One extra row says whether there's a next page, without counting
+        rows = list(queryset[: self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[: self.per_page]
+            next_cursor = self.encode_cursor(rows[-1].keyset_value, rows[-1].pk)
+        return KeysetPage(rows, cursor if position is not None else None, next_cursor)
+
+
+def defer_for_listing(queryset):
+    """
+    Leave the large columns that listings never read out of a specific page queryset,
+    see `PreviewablePage.listing_deferred_fields`.
+    """
+    if not hasattr(queryset.model, "listing_deferred_fields"):
+        return queryset
+    return queryset.defer(*queryset.model.listing_deferred_fields())
+
+
+def specific_pages(pages, for_listing=False):
+    """
+    Bulk equivalent of `[page.specific for page in pages]`, with one query per content type.
     """
-    translations = page.get_translations(inclusive=True).all()
-    related_pages = []
-    for translation in translations:
-        related_pages += list(getattr(translation, property).all())
-    return localized_pages(ensure_1D_list(related_pages))
+    pages = list(pages)
+    ids_by_model = defaultdict(list)
+    for page in pages:
+        model = ContentType.objects.get_for_id(page.content_type_id).model_class()
+        if model is not None and not isinstance(page, model):
+            ids_by_model[model].append(page.pk)
 
+    specific = {}
+    for model, ids in ids_by_model.items():
+        queryset = model._default_manager.all()
+        if for_listing:
+            queryset = defer_for_listing(queryset)
+        specific.update(queryset.in_bulk(ids))
 
-def localized_pages(pages):
-    return list({p.specific.localized for p in list(pages)})
+    return [specific.get(page.pk, page) for page in pages]
 
 
 def model_subclasses(mclass):
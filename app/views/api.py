@@ -1,13 +1,58 @@
+import hashlib
+
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.http import Http404, HttpResponse
 from django.urls import path
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from drf_spectacular.utils import extend_schema
 from rest_framework import serializers, viewsets
 from rest_framework.response import Response
-from wagtail.api.v2.utils import BadRequestError
 from wagtail.core.models import Page
 
 from app.models import EventPage, OrganisationPage, PersonPage, ProjectPage
+from app.models.wagtail.mixins import GeocodedMixin
 from app.serializers import PageCoordinatesSerializer
-from app.utils.wagtail import localized_pages
+from app.utils.map_feed import (
+    cluster_features,
+    get_map_feed,
+    get_map_feed_index,
+    get_map_pages,
+    map_page_types,
+    render_features,
+)
+from app.utils.map_tiles import get_map_tile, is_valid_tile
+from app.utils.wagtail import abstract_page_query_filter
+
+
+def parse_bbox(value):
+    """
+    Parse a `min_lng,min_lat,max_lng,max_lat` string into a WGS84 polygon.
+    Boxes that cross the antimeridian are split in two.
+    """
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(n) for n in value.split(","))
+    except ValueError:
+        raise serializers.ValidationError(
+            "Expected four comma-separated numbers: min_lng,min_lat,max_lng,max_lat"
+        )
+    if not (-90 <= min_lat <= max_lat <= 90):
+        raise serializers.ValidationError("Latitudes must be between -90 and 90")
+    if max_lng - min_lng >= 360:
+        return None
+
+    # Normalise longitudes into -180..180
+    min_lng = (min_lng + 180) % 360 - 180
+    max_lng = (max_lng + 180) % 360 - 180
+    if min_lng <= max_lng:
+        bbox = Polygon.from_bbox((min_lng, min_lat, max_lng, max_lat))
+    else:
+        bbox = MultiPolygon(
+            Polygon.from_bbox((min_lng, min_lat, 180, max_lat)),
+            Polygon.from_bbox((-180, min_lat, max_lng, max_lat)),
+        )
+    bbox.srid = 4326
+    return bbox
 
 
 class MapSearchViewset(viewsets.ReadOnlyModelViewSet):
@@ -15,31 +60,144 @@ class MapSearchViewset(viewsets.ReadOnlyModelViewSet):
     Query the page metadata index, filtering by tag, returning a geojson FeatureCollection
     """
 
-    page_types = (
-        ProjectPage,
-        OrganisationPage,
-        PersonPage,
-        EventPage,
-    )
+    page_types = map_page_types
+
+    type_params = {
+        "projects": ProjectPage,
+        "organisations": OrganisationPage,
+        "people": PersonPage,
+        "events": EventPage,
+    }
+
+    # Server-side clustering is only applied below this zoom level
+    cluster_max_zoom = 10
 
     class RequestSerializer(serializers.Serializer):
-        pass
+        bbox = serializers.CharField(
+            required=False,
+            help_text="Only return pages inside this box: min_lng,min_lat,max_lng,max_lat",
+        )
+        zoom = serializers.IntegerField(
+            required=False,
+            min_value=0,
+            max_value=22,
+            help_text="Map zoom level, used to size clusters",
+        )
+        type = serializers.ChoiceField(
+            required=False,
+            choices=["projects", "organisations", "people", "events"],
+            help_text="Only return pages of this type",
+        )
+        cluster = serializers.BooleanField(
+            required=False,
+            default=False,
+            help_text="Group nearby pages into cluster points with counts",
+        )
+
+        def validate_bbox(self, value):
+            return parse_bbox(value)
 
     model = Page
     serializer_class = PageCoordinatesSerializer
 
-    def get_queryset(self):
+    def get_params(self):
         params = MapSearchViewset.RequestSerializer(data=self.request.GET)
-        if not params.is_valid():
-            raise BadRequestError()
+        # Raises a DRF ValidationError, which is answered with a 400
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
+    def get_queryset(self):
+        params = self.get_params()
 
         # If no filters, return all possible geo pages
-        return Page.objects.live().specific().type(*self.page_types)
+        qs = get_map_pages()
+
+        page_type = params.get("type")
+        if page_type is not None:
+            qs = qs.type(self.type_params[page_type])
+
+        bbox = params.get("bbox")
+        if bbox is not None:
+            qs = qs.filter(
+                abstract_page_query_filter(GeocodedMixin, {"map_point__within": bbox})
+            )
+
+        return qs
 
     @extend_schema(parameters=[RequestSerializer])
     def list(self, request):
-        pages = localized_pages(self.get_queryset())
-        return Response(PageCoordinatesSerializer(pages, many=True).data)
+        params = self.get_params()
+        feed = get_map_feed()
+
+        if not self.is_filtered(params) and not self.is_clustered(params):
+            return self.feed_response(request, feed["body"], feed)
+
+        # Variants of the feed are versioned by the feed itself plus the query
+        etag = hashlib.sha1(
+            (feed["etag"] + request.GET.urlencode()).encode()
+        ).hexdigest()
+        return self.feed_response(
+            request,
+            lambda: render_features(self.get_features(params)),
+            {**feed, "etag": f'"{etag}"'},
+        )
+
+    def is_filtered(self, params):
+        return params.get("type") is not None or params.get("bbox") is not None
+
+    def is_clustered(self, params):
+        return params["cluster"] and params.get("zoom", 0) < self.cluster_max_zoom
+
+    def get_features(self, params):
+        index = get_map_feed_index()
+
+        if self.is_filtered(params):
+            # Spatial and type filtering happens in the database,
+            # the matching features are then picked out of the cached feed
+            translation_keys = {
+                str(key)
+                for key in self.get_queryset().values_list("translation_key", flat=True)
+            }
+            index = {
+                translation_key: group
+                for translation_key, group in index.items()
+                if translation_key in translation_keys
+            }
+
+        features = [feature for group in index.values() for feature in group]
+
+        if self.is_clustered(params):
+            features = cluster_features(features, params.get("zoom", 0))
+
+        return features
+
+    def tile(self, request, z, x, y):
+        """
+        Serve the map feed as Mapbox vector tiles, rendered by PostGIS
+        """
+        if not is_valid_tile(z, x, y):
+            raise Http404("No such tile")
+        tile, feed = get_map_tile(z, x, y)
+        return self.feed_response(
+            request, tile, feed, content_type="application/vnd.mapbox-vector-tile"
+        )
+
+    def feed_response(self, request, body, feed, content_type="application/json"):
+        """
+        Serve a feed body, answering conditional requests with a 304
+        """
+        last_modified = int(feed["last_modified"].timestamp())
+        response = get_conditional_response(
+            request, etag=feed["etag"], last_modified=last_modified
+        )
+        if response is None:
+            response = HttpResponse(
+                body() if callable(body) else body, content_type=content_type
+            )
+        response["ETag"] = feed["etag"]
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
 
     def get_object(self, request):
         page = self.get_queryset()
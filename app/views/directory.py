@@ -1,18 +1,22 @@
 # View for the block, that takes URL query params (?page_type=…&category=…&sort=…) and outputs the queryset, other template context, renders the template
 
 import datetime
+import hashlib
+import json
 
 from django import forms
-from django.contrib.postgres.search import SearchHeadline, SearchQuery
-from django.core.paginator import Paginator
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.db.models import Q
-from django.utils.html import format_html
-from django.utils.safestring import mark_safe
+from django.utils import translation
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 from django.views.generic import TemplateView
 from wagtail.core.models import Page
 from wagtail.search.models import Query
 
-from app.helpers import concat_html, safe_to_int
+from app.helpers import safe_to_int
 from app.models import (
     ArticlePage,
     CountryPage,
@@ -23,16 +27,80 @@ from app.models import (
     PersonPage,
     ProjectPage,
 )
-from app.models.wagtail.mixins import GeocodedMixin, RelatedImpactAreaMixin
+from app.utils.cache import django_cached, get_generations
+from app.utils.cards import load_cards
+from app.utils.page_cache import page_cache_query
+from app.utils.page_metadata import facet_counts, valid_uuids
 from app.utils.python import ensure_1D_list
-from app.utils.wagtail import abstract_page_query_filter, localized_pages
+from app.utils.search import match_pages, search_pages
+from app.utils.wagtail import (
+    CountingPaginator,
+    KeysetPaginator,
+    defer_for_listing,
+    distinct_translations,
+    localized_pages,
+)
+
+
+def page_options_key(model):
+    label = model._meta.label_lower
+    generation = get_generations([label])[label]
+    return f"{label}.{translation.get_language()}.{generation}"
+
+
+@django_cached("directory.options", get_key=page_options_key, ttl=60 * 60 * 24)
+def page_options(model):
+    """
+    Filter options for the live pages of a type, localised and sorted by title.
+    Cached per language until a page of that type is published or unpublished.
+    """
+    pages = localized_pages(
+        defer_for_listing(model.objects.live().public().order_by("title")),
+        for_listing=True,
+    )
+    return sorted(
+        ({"value": str(page.filter_url_value), "label": page.title} for page in pages),
+        key=lambda option: option["label"],
+    )
+
+
+def year_options():
+    return [
+        {"value": str(year), "label": str(year)}
+        for year in range(2010, datetime.date.today().year + 1)
+    ]
+
+
+def year_condition(values):
+    """
+    Pages published in any of the years, or no condition if none of them parse
+    """
+    years = [
+        year for year in map(safe_to_int, ensure_1D_list(values)) if year is not None
+    ]
+    if not years:
+        return Q()
+    return Q(metadata_index__years__overlap=years)
+
+
+def impact_area_condition(values):
+    """
+    Pages in any of the impact areas, or no condition if none of the keys parse
+    """
+    keys = valid_uuids(ensure_1D_list(values))
+    if not keys:
+        return Q()
+    return Q(metadata_index__impact_area_keys__overlap=keys)
 
 
 class DirectoryView(TemplateView):
     template_name = "app/include/frames/directory.html"
+    append_template_name = "app/frames/directory_page.html"
     page_model = Page
-    search_highlight_field = "content"
     per_page = 9
+    # Browsing is paged through the metadata index's (sort_date, page) index
+    sort_field = "metadata_index__sort_date"
+    facet_cache_timeout = 60 * 5
 
     page_types = {
         "projects": ProjectPage,
@@ -48,55 +116,30 @@ class DirectoryView(TemplateView):
             "url_param": "year",
             "label": "Year",
             "widget": "dropdown",
-            "options": lambda: range(2010, datetime.date.today().year + 1),
-            "query": lambda qs, values: qs.filter(
-                Q(
-                    first_published_at__year__in=map(
-                        lambda v: int(v), ensure_1D_list(values)
-                    )
-                )
-                | Q(
-                    last_published_at__year__in=map(
-                        lambda v: int(v), ensure_1D_list(values)
-                    )
-                )
-            ),
+            "options": year_options,
+            "condition": year_condition,
+            "facet_field": "years",
         },
         {
             "url_param": "impact_area",
             "label": "Impact Areas",
             "widget": "dropdown",
-            "options": lambda: sorted(
-                localized_pages(
-                    ImpactAreaPage.objects.live().public().all().order_by("title")
-                ),
-                key=lambda p: p.title,
-            ),
-            "query": lambda qs, values: qs.filter(
-                abstract_page_query_filter(
-                    RelatedImpactAreaMixin,
-                    dict(
-                        related_impact_areas__translation_key__in=ensure_1D_list(values)
-                    ),
-                )
-            ),
+            "options": lambda: page_options(ImpactAreaPage),
+            "condition": impact_area_condition,
+            "facet_field": "impact_area_keys",
         },
         {
             "url_param": "country",
             "label": "Countries",
             "widget": "dropdown",
-            "options": lambda: sorted(
-                localized_pages(
-                    CountryPage.objects.live().public().all().order_by("title")
-                ),
-                key=lambda p: p.title,
-            ),
-            "query": lambda qs, values: qs.filter(
-                abstract_page_query_filter(
-                    GeocodedMixin,
-                    dict(related_countries__isoa2__in=ensure_1D_list(values)),
-                )
+            "options": lambda: page_options(CountryPage),
+            "condition": lambda values: Q(
+                metadata_index__country_codes__overlap=[
+                    str(value).upper() for value in ensure_1D_list(values)
+                ]
             ),
+            "facet_field": "country_codes",
+            "facet_value": lambda value: str(value).upper(),
         },
     ]
 
@@ -106,14 +149,45 @@ class DirectoryView(TemplateView):
             for filter in self.filters
         ]
 
+    @cached_property
+    def filter_options(self):
+        return {filter["url_param"]: filter["options"]() for filter in self.filters}
+
+    def page_type_condition(self, page_types):
+        return Q(
+            metadata_index__content_type__in=ContentType.objects.get_for_models(
+                *page_types
+            ).values()
+        )
+
+    def get_conditions(self):
+        """
+        The condition that the page type and each filter set in the request
+        put on the results, by URL parameter.
+        """
+        conditions = {}
+        type = self.request.GET.get("type", None)
+        if type is not None and type in self.page_types.keys():
+            conditions["type"] = self.page_type_condition([self.page_types[type]])
+
+        for filter in self.current_filters(self.request):
+            if filter["current_value"] is not None and len(filter["current_value"]) > 0:
+                condition = filter["condition"](filter["current_value"])
+                if condition:
+                    conditions[filter["url_param"]] = condition
+        return conditions
+
     def get_queryset(self):
-        qs = Page.objects.live().public()
+        # Filtered through the metadata index, see `app.utils.page_metadata`
+        qs = Page.objects.filter(metadata_index__live=True, metadata_index__public=True)
         scope = self.get_scope()
 
         if scope is None:
             return qs
 
-        return qs.descendant_of(scope)
+        return qs.filter(metadata_index__path__startswith=scope.path).exclude(
+            pk=scope.pk
+        )
 
     def get_search_query(self):
         return self.request.GET.get("query", None)
@@ -127,80 +201,186 @@ class DirectoryView(TemplateView):
         return Page.objects.filter(pk=scope_id).first()
 
     def do_search(self):
-        qs = self.get_queryset()
+        qs = self.get_queryset().filter(
+            self.page_type_condition(self.page_types.values())
+        )
         search_query = self.get_search_query()
 
-        type = self.request.GET.get("type", None)
-        if type is not None and type in self.page_types.keys():
-            qs = qs.type(self.page_types[type])
-        else:
-            qs = qs.type(tuple(self.page_types.values()))
-
-        for filter in self.current_filters(self.request):
-            if filter["current_value"] is not None and len(filter["current_value"]) > 0:
-                qs = filter["query"](qs, filter["current_value"])
+        for condition in self.get_conditions().values():
+            qs = qs.filter(condition)
 
         if search_query is not None:
-            query = Query.get(search_query)
-            query.add_hit()
+            if not self.is_append_request():
+                query = Query.get(search_query)
+                query.add_hit()
 
-            return qs.search(search_query)
+            return search_pages(qs, search_query)
 
         else:
             return qs
 
-    def get_search_highlight(self, page):
-        if hasattr(page, self.search_highlight_field):
-            highlighter = SearchHeadline(
-                self.search_highlight_field,
-                query=SearchQuery(self.get_search_query()),
-                min_words=60,
-                max_words=80,
-                start_sel="<cksearch:hl>",
-                stop_sel="</cksearch:hl>",
-            )
+    def get_facet_counts(self):
+        """
+        The number of results, and how many there would be for each page type
+        and filter option with the other filters left as they are, grouped by
+        the metadata index's columns in one statement.
+        """
+        qs = self.get_queryset().filter(
+            self.page_type_condition(self.page_types.values())
+        )
+        search_query = self.get_search_query()
+        if search_query is not None:
+            qs = match_pages(qs, search_query)
+
+        conditions = self.get_conditions()
 
-            highlights_raw = (
-                type(page)
-                .objects.annotate(search_highlight=highlighter)
-                .get(id=page.id)
-                .search_highlight
+        def facet_pages(url_param):
+            return qs.filter(
+                *(
+                    condition
+                    for param, condition in conditions.items()
+                    if param != url_param
+                )
             )
 
-            highlight_groups = list(
-                hl.split("</cksearch:hl>")
-                for hl in highlights_raw.split("<cksearch:hl>")
+        facets = {
+            "total": (qs.filter(*conditions.values()), None),
+            "type": (facet_pages("type"), "content_type"),
+        }
+        for filter in self.filters:
+            facets[filter["url_param"]] = (
+                facet_pages(filter["url_param"]),
+                filter["facet_field"],
             )
-            start = highlight_groups.pop(0)[0]
+        counts = facet_counts(facets)
 
-            highlights = tuple(
-                format_html(
-                    '<span class="search-highlight">{}</span>{}',
-                    mark_safe(highlight),
-                    next,
+        content_types = ContentType.objects.get_for_models(*self.page_types.values())
+        result = {
+            "total": counts["total"],
+            "type": {
+                type: counts["type"].get(str(content_types[page_type].pk), 0)
+                for type, page_type in self.page_types.items()
+            },
+        }
+        for filter in self.filters:
+            facet_value = filter.get("facet_value", str)
+            result[filter["url_param"]] = {
+                option["value"]: counts[filter["url_param"]].get(
+                    facet_value(option["value"]), 0
                 )
-                for highlight, next in highlight_groups
+                for option in self.filter_options[filter["url_param"]]
+            }
+        return result
+
+    def get_facet_cache_key(self):
+        params = self.request.GET.copy()
+        for param in ("page", "after"):
+            params.pop(param, None)
+        labels = [
+            model._meta.label_lower
+            for model in [*self.page_types.values(), CountryPage, ImpactAreaPage]
+        ]
+        key = json.dumps(
+            [
+                page_cache_query(params),
+                translation.get_language(),
+                get_generations(labels),
+            ],
+            sort_keys=True,
+        )
+        return f"directory.facets.{hashlib.sha1(key.encode()).hexdigest()}"
+
+    @cached_property
+    def facets(self):
+        """
+        `get_facet_counts`, cached for every page of a set of results, and
+        refreshed when a page of a type they count is published or unpublished.
+        """
+        key = self.get_facet_cache_key()
+        counts = cache.get(key)
+        if counts is None:
+            counts = self.get_facet_counts()
+            cache.set(key, counts, self.facet_cache_timeout)
+        return counts
+
+    def is_append_request(self):
+        """
+        Whether Turbo is loading the next page of results onto the end of the list
+        """
+        return self.request.headers.get("Turbo-Frame", "").startswith("directory-page-")
+
+    def get_template_names(self):
+        if self.is_append_request():
+            return [self.append_template_name]
+        return super().get_template_names()
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        # The same URL renders a whole page or just the next page of results
+        patch_vary_headers(response, ["Turbo-Frame"])
+        return response
+
+    def paginate(self, search_results):
+        """
+        Search results are ranked, so are paged by number. Otherwise pages
+        are fetched by cursor, newest first, in the same time however deep they are.
+        """
+        if self.get_search_query() is None:
+            paginator = KeysetPaginator(
+                search_results, self.per_page, self.sort_field, to_python=parse_datetime
             )
+            return paginator, paginator.page(self.request.GET.get("after"))
 
-            return concat_html(start, *highlights)
+        paginator = CountingPaginator(
+            search_results, self.per_page, count=self.facets["total"]
+        )
+        current_page_number = max(
+            1, min(paginator.num_pages, safe_to_int(self.request.GET.get("page"), 1))
+        )
+        return paginator, paginator.page(current_page_number)
 
     def get_context_data(self, **kwargs):
-        scope = self.get_scope()
-        search_results = self.do_search()
-        paginator = Paginator(search_results, self.per_page)
-        current_page_number = max(1, int(self.request.GET.get("page", 1)))
-        paginator_page = paginator.page(current_page_number)
+        paginator, paginator_page = self.paginate(
+            distinct_translations(self.do_search())
+        )
 
         kwargs.update(
             {
-                "scope": scope,
                 "search_query": self.get_search_query(),
-                "pages": lambda: localized_pages(paginator_page),
+                "pages": lambda: load_cards(
+                    localized_pages(paginator_page, for_listing=True)
+                ),
                 "paginator_page": paginator_page,
                 "paginator": paginator,
-                "page_types": self.page_types.keys(),
                 "request": self.request,
-                "filters": self.current_filters(self.request),
+            }
+        )
+        if self.is_append_request():
+            kwargs["frame_id"] = self.request.headers["Turbo-Frame"]
+            return super().get_context_data(**kwargs)
+
+        facets = self.facets
+        kwargs.update(
+            {
+                "scope": self.get_scope(),
+                "total_count": facets["total"],
+                "page_types": [
+                    {"value": type, "count": facets["type"][type]}
+                    for type in self.page_types.keys()
+                ],
+                "filters": [
+                    {
+                        **filter,
+                        "options": [
+                            {
+                                **option,
+                                "count": facets[filter["url_param"]][option["value"]],
+                            }
+                            for option in self.filter_options[filter["url_param"]]
+                        ],
+                    }
+                    for filter in self.current_filters(self.request)
+                ],
             }
         )
 
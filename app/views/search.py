@@ -1,17 +1,15 @@
-from django.contrib.postgres.search import SearchHeadline, SearchQuery
-from django.core.paginator import Paginator
-from django.utils.safestring import mark_safe
 from django.views.generic import TemplateView
 from wagtail.core.models import Page
 from wagtail.search.models import Query
 
-from app.helpers import concat_html, safe_to_int
+from app.helpers import safe_to_int
+from app.utils.search import search_highlights, search_pages, search_section
+from app.utils.wagtail import CountingPaginator, distinct_translations, localize_pages
 
 
 class SearchView(TemplateView):
     template_name = "app/search.html"
     page_model = Page
-    search_highlight_field = "content"
     per_page = 9
 
     def get_queryset(self):
@@ -44,50 +42,39 @@ class SearchView(TemplateView):
             query = Query.get(search_query)
             query.add_hit()
 
-            return self.get_queryset().search(search_query)
+            return search_pages(self.get_queryset(), search_query)
 
         else:
             return self.get_queryset().none()
 
-    def get_search_highlight(self, page):
-        if hasattr(page, self.search_highlight_field):
-            highlighter = SearchHeadline(
-                self.search_highlight_field,
-                query=SearchQuery(self.get_search_query()),
-                min_words=60,
-                max_words=80,
-                start_sel="<cksearch:hl>",
-                stop_sel="</cksearch:hl>",
-            )
-
-            highlights_raw = (
-                type(page)
-                .objects.annotate(search_highlight=highlighter)
-                .get(id=page.id)
-                .search_highlight
-            )
-
-            highlight_groups = list(
-                hl.split("</cksearch:hl>")
-                for hl in highlights_raw.split("<cksearch:hl>")
-            )
-            start = highlight_groups.pop(0)[0]
-
-            highlights = tuple(
-                format_html(
-                    '<span class="search-highlight">{}</span>{}',
-                    mark_safe(highlight),
-                    next,
-                )
-                for highlight, next in highlight_groups
-            )
+    def get_search_highlights(self, pages):
+        search_query = self.get_search_query()
+        if not search_query:
+            return {}
+        return search_highlights(pages, search_query)
 
-            return concat_html(start, *highlights)
+    def get_search_results(self, paginator_page):
+        pages = localize_pages(paginator_page, for_listing=True)
+        highlights = self.get_search_highlights(pages)
+        search_query = self.get_search_query()
+        return [
+            {
+                "page": page,
+                "search_highlight": highlights.get(page.pk),
+                "search_section": search_section(
+                    getattr(page, "heading_outline", None), search_query
+                )
+                if search_query
+                else None,
+            }
+            for page in pages
+        ]
 
     def get_context_data(self, **kwargs):
         scope = self.get_scope()
-        search_results = list({p.localized for p in self.do_search()})
-        paginator = Paginator(search_results, self.per_page)
+        paginator = CountingPaginator(
+            distinct_translations(self.do_search()), self.per_page
+        )
         current_page_number = max(
             1, min(paginator.num_pages, safe_to_int(self.request.GET.get("page"), 1))
         )
@@ -97,16 +84,7 @@ class SearchView(TemplateView):
             {
                 "scope": scope,
                 "search_query": self.get_search_query(),
-                "search_results": lambda: [
-                    {
-                        "page": page,
-                        "search_highlight": lambda: self.get_search_highlight(
-                            page.specific
-                        ),
-                    }
-                    for page in paginator_page
-                ],
-                "pages": lambda: [page.specific for page in paginator_page],
+                "search_results": lambda: self.get_search_results(paginator_page),
                 "total_count": paginator.count,
                 "paginator_page": paginator_page,
                 "paginator": paginator,
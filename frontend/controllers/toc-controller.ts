@@ -9,6 +9,7 @@ class CustomController extends Controller {
     // Targets
     static targets = ["toc", "content"];
     readonly tocTarget!: HTMLElement;
+    readonly hasTocTarget!: boolean;
     readonly contentTarget!: HTMLFormElement;
 
     // Values
@@ -28,7 +29,18 @@ class CustomController extends Controller {
     // @ts-ignore
     readonly optionsValue!: tocbot.IStaticOptions;
 
+    observer?: IntersectionObserver;
+
     async connect() {
+        if (!this.hasTocTarget) return;
+
+        if (this.tocTarget.hasAttribute("data-toc-rendered")) {
+            // The server rendered the contents from the page's stored outline,
+            // so only the active link needs tracking
+            this.highlightActiveLinks();
+            return;
+        }
+
         // @ts-ignore
         tocbot.init({
             // Where to render the table of contents.
@@ -44,9 +56,42 @@ class CustomController extends Controller {
         });
     }
 
+    highlightActiveLinks() {
+        const activeClass: string = this.optionsValue?.activeLinkClass || "is-active-link";
+        const links = Array.from(
+            this.tocTarget.querySelectorAll<HTMLAnchorElement>("a[href^='#']"),
+        );
+        const scrollContainer = this.optionsValue?.scrollContainer
+            ? document.querySelector(this.optionsValue.scrollContainer)
+            : null;
+
+        this.observer = new IntersectionObserver(
+            (entries) => {
+                const visible = entries.find((entry) => entry.isIntersecting);
+                if (!visible) return;
+                for (const link of links) {
+                    link.classList.toggle(
+                        activeClass,
+                        link.hash === `#${visible.target.id}`,
+                    );
+                }
+            },
+            { root: scrollContainer, rootMargin: "0px 0px -80% 0px" },
+        );
+
+        for (const link of links) {
+            const heading = document.getElementById(decodeURIComponent(link.hash.slice(1)));
+            if (heading) this.observer.observe(heading);
+        }
+    }
+
     disconnect(): void {
+        if (this.observer) {
+            this.observer.disconnect();
+            return;
+        }
         // @ts-ignore
-        window.tocbot.destroy();
+        window.tocbot?.destroy();
     }
 }
 
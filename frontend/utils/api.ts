@@ -17,7 +17,20 @@ export type GeocodedPageFeatureCollection = GeoJSON.FeatureCollection<
     GeocodedPageFeatureProperties
 >;
 
-export async function getMapData(url: string) {
-    const data = await fetch(url, { cache: "force-cache" });
+export type MapDataParams = {
+    bbox?: [number, number, number, number];
+    zoom?: number;
+    type?: "projects" | "organisations" | "people" | "events";
+    cluster?: boolean;
+};
+
+export async function getMapData(url: string, params: MapDataParams = {}) {
+    const query = new URLSearchParams();
+    for (const [key, value] of Object.entries(params)) {
+        if (value !== undefined) query.set(key, String(value));
+    }
+    if (Array.from(query).length) url += `?${query}`;
+    // Revalidate against the server's ETag, which answers with a 304 if the feed is unchanged
+    const data = await fetch(url, { cache: "no-cache" });
     return (await data.json()) as GeocodedPageFeatureCollection;
 }